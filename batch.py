@@ -0,0 +1,424 @@
+"""
+Exports packages from many .blend files at once, by running several
+background Blender processes side by side:
+
+    python batch.py --blender /opt/blender/blender --workers 6 \
+        --report build/attributes.json assets/*.blend
+
+Each .blend file is a job, which runs cli.py in its own Blender process.
+Jobs can also be listed in a JSON file with --jobs, as a list of objects
+with a "blend" path and (optionally) "packages" and "output_dir".
+
+Jobs are spread across the workers by how long they're expected to take
+(how long they took last time, or how big the file is), longest first.
+Each worker has its own queue; once it runs dry, it steals from whichever
+queue has the most work left in it. Every job's result, timing and
+failure ends up in a single JSON report.
+
+When a report from a previous run exists, jobs that succeeded last time
+and whose outputs are newer than their .blend file are skipped. Use
+--force to run everything anyway.
+
+This script only needs the standard library and doesn't import anything
+from the add-on, so it runs outside of Blender. --blender can point at
+any executable that takes Blender's arguments, such as a stand-in script
+for testing.
+"""
+
+import argparse
+import collections
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Deque, Dict, List, Optional
+
+DEFAULT_ADDON_MODULE = "attribute_exporter"
+
+# how much of a failed job's output makes it into the report
+LOG_TAIL = 4000
+
+
+class Job:
+    blend: str
+    packages: Optional[List[str]]
+    output_dir: Optional[str]
+    cost: float
+    previous: Optional[Dict]
+
+    def __init__(self, blend: str, packages: Optional[List[str]] = None, output_dir: Optional[str] = None):
+        self.blend = os.path.abspath(blend)
+        self.packages = list(packages) if packages else None
+        self.output_dir = output_dir
+        self.cost = 0.0
+        self.previous = None
+
+    @property
+    def key(self) -> str:
+        packages = ",".join(self.packages) if self.packages else "*"
+        return f"{self.blend}|{packages}|{self.output_dir or ''}"
+
+    def get_output_dir(self) -> Optional[str]:
+        if self.output_dir is None:
+            return None
+
+        name = os.path.splitext(os.path.basename(self.blend))[0]
+        return os.path.abspath(self.output_dir.replace("{name}", name))
+
+    def is_up_to_date(self) -> bool:
+        """
+        Whether the previous run of this job succeeded and wrote everything
+        after the .blend file was last saved. Packages the exporter found
+        unchanged aren't rewritten, so the time the previous run started
+        counts as well.
+        """
+        if not succeeded(self.previous):
+            return False
+
+        packages = (self.previous.get("result") or {}).get("packages")
+
+        if not packages or not os.path.exists(self.blend):
+            return False
+
+        modified = os.path.getmtime(self.blend)
+
+        for package in packages:
+            path = package.get("path")
+
+            if not path or not os.path.exists(path):
+                return False
+
+            if os.path.getmtime(path) < modified and self.previous.get("started", 0) < modified:
+                return False
+
+        return True
+
+
+def succeeded(entry: Optional[Dict]) -> bool:
+    # skipped jobs keep the results of the run that actually exported them
+    return entry is not None and entry.get("status") in ("ok", "skipped")
+
+
+def estimate_costs(jobs: List[Job]) -> None:
+    """
+    Guesses how many seconds each job will take. Jobs that ran before are
+    expected to take as long as they did then; the rest are guessed from
+    their file size, at the rate the known jobs ran at.
+    """
+    known_seconds = 0.0
+    known_bytes = 0
+
+    for job in jobs:
+        if succeeded(job.previous) and os.path.exists(job.blend):
+            known_seconds += job.previous["seconds"]
+            known_bytes += os.path.getsize(job.blend)
+
+    # without any history, sizes still put the jobs in a sensible order
+    rate = known_seconds / known_bytes if known_bytes else 1e-6
+
+    for job in jobs:
+        if succeeded(job.previous):
+            job.cost = job.previous["seconds"]
+        elif os.path.exists(job.blend):
+            job.cost = os.path.getsize(job.blend) * rate
+        else:
+            job.cost = 0.0
+
+
+class Scheduler:
+    """
+    Hands out jobs to workers. Jobs are dealt out longest first, each to
+    whichever worker has the least work so far; workers take jobs from the
+    front of their own queue, and steal from the back of the fullest queue
+    once theirs is empty.
+    """
+
+    queues: List[Deque[Job]]
+    remaining: List[float]
+    lock: threading.Lock
+
+    def __init__(self, jobs: List[Job], workers: int):
+        self.queues = [collections.deque() for _ in range(workers)]
+        self.remaining = [0.0] * workers
+        self.lock = threading.Lock()
+
+        for job in sorted(jobs, key=lambda job: -job.cost):
+            worker = min(range(workers), key=lambda index: self.remaining[index])
+            self.queues[worker].append(job)
+            self.remaining[worker] += job.cost
+
+    def take(self, worker: int) -> Optional[Job]:
+        with self.lock:
+            if self.queues[worker]:
+                job = self.queues[worker].popleft()
+                self.remaining[worker] -= job.cost
+                return job
+
+            victims = [index for index, queue in enumerate(self.queues) if queue]
+
+            if not victims:
+                return None
+
+            victim = max(victims, key=lambda index: (self.remaining[index], len(self.queues[index])))
+            job = self.queues[victim].pop()
+            self.remaining[victim] -= job.cost
+            return job
+
+
+class Batch:
+    args: argparse.Namespace
+    jobs: List[Job]
+    results: Dict[str, Dict]
+    finished: int
+    directory: str
+    lock: threading.Lock
+
+    def __init__(self, args: argparse.Namespace, jobs: List[Job]):
+        self.args = args
+        self.jobs = jobs
+        self.results = {}
+        self.finished = 0
+        self.directory = ""
+        self.lock = threading.Lock()
+
+    def get_command(self, job: Job, report: str) -> List[str]:
+        expression = f"import {self.args.addon_module}.cli as cli; cli.main()"
+        command = [self.args.blender, "-b", job.blend, "--python-expr", expression, "--"]
+
+        for package in job.packages or []:
+            command += ["--package", package]
+
+        output_dir = job.get_output_dir()
+
+        if output_dir:
+            command += ["--output-dir", output_dir]
+        if self.args.threads is not None:
+            command += ["--threads", str(self.args.threads)]
+        if self.args.chunk_size is not None:
+            command += ["--chunk-size", str(self.args.chunk_size)]
+        if self.args.no_cache:
+            command.append("--no-cache")
+
+        return command + ["--report", report]
+
+    def run_job(self, job: Job, worker: int, index: int) -> Dict:
+        report = os.path.join(self.directory, f"job-{index}.json")
+        command = self.get_command(job, report)
+
+        entry = {
+            "key": job.key,
+            "blend": job.blend,
+            "packages": job.packages,
+            "output_dir": job.get_output_dir(),
+            "worker": worker,
+            "estimated_seconds": job.cost,
+            "started": time.time(),
+        }
+
+        start = time.perf_counter()
+        error = None
+
+        try:
+            process = subprocess.run(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                errors="replace",
+                timeout=self.args.timeout,
+            )
+            returncode, log = process.returncode, process.stdout
+        except subprocess.TimeoutExpired as e:
+            log = e.stdout or ""
+            if isinstance(log, bytes):
+                log = log.decode("utf-8", "replace")
+            returncode, error = None, f"Timed out after {self.args.timeout}s"
+        except OSError as e:
+            returncode, log, error = None, "", f"Couldn't run {self.args.blender}: {e}"
+
+        entry["seconds"] = time.perf_counter() - start
+        entry["returncode"] = returncode
+
+        result = None
+
+        if os.path.exists(report):
+            with open(report) as file:
+                result = json.load(file)
+
+        entry["result"] = result
+
+        if error is None and result is not None and result.get("error"):
+            error = result["error"]
+        if error is None and (returncode != 0 or result is None):
+            error = f"Blender exited with {returncode} without a result"
+
+        entry["status"] = "ok" if error is None else "failed"
+        entry["error"] = error
+
+        if error is not None:
+            entry["log"] = log[-LOG_TAIL:]
+
+        return entry
+
+    def work(self, scheduler: Scheduler, worker: int, indices: Dict[str, int]) -> None:
+        while True:
+            job = scheduler.take(worker)
+
+            if job is None:
+                return
+
+            entry = self.run_job(job, worker, indices[job.key])
+
+            with self.lock:
+                self.results[job.key] = entry
+                self.finished += 1
+                print(f"[{self.finished}/{len(indices)}] {entry['status']}: {job.blend} ({entry['seconds']:.1f}s)")
+
+    def run(self) -> Dict:
+        started = time.time()
+        start = time.perf_counter()
+        pending = []
+
+        for job in self.jobs:
+            if not self.args.force and job.is_up_to_date():
+                entry = dict(job.previous)
+                entry["status"] = "skipped"
+                self.results[job.key] = entry
+            else:
+                pending.append(job)
+
+        estimate_costs(pending)
+
+        workers = max(1, min(self.args.workers, len(pending)))
+        scheduler = Scheduler(pending, workers)
+        indices = {job.key: index for index, job in enumerate(pending)}
+
+        with tempfile.TemporaryDirectory(prefix="attribute-exporter-batch-") as directory:
+            self.directory = directory
+
+            threads = [
+                threading.Thread(target=self.work, args=(scheduler, worker, indices), name=f"worker-{worker}")
+                for worker in range(workers)
+            ]
+
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        jobs = [self.results[job.key] for job in self.jobs]
+        counts = collections.Counter(entry["status"] for entry in jobs)
+
+        return {
+            "blender": self.args.blender,
+            "workers": workers,
+            "started": started,
+            "seconds": time.perf_counter() - start,
+            "summary": {status: counts.get(status, 0) for status in ("ok", "skipped", "failed")},
+            "jobs": jobs,
+        }
+
+
+def load_jobs(args: argparse.Namespace) -> List[Job]:
+    jobs = [Job(blend, args.packages, args.output_dir) for blend in args.blends]
+
+    if args.jobs:
+        with open(args.jobs) as file:
+            for item in json.load(file):
+                jobs.append(
+                    Job(
+                        item["blend"],
+                        item.get("packages", args.packages),
+                        item.get("output_dir", args.output_dir),
+                    )
+                )
+
+    unique = {}
+
+    for job in jobs:
+        unique.setdefault(job.key, job)
+
+    return list(unique.values())
+
+
+def load_previous(path: Optional[str]) -> Dict[str, Dict]:
+    if not path or not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path) as file:
+            report = json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+    return {entry["key"]: entry for entry in report.get("jobs", []) if "key" in entry}
+
+
+def parse_arguments(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("blends", nargs="*", help=".blend files to export from")
+    parser.add_argument("--jobs", metavar="FILE", help="A JSON file listing more jobs")
+    parser.add_argument("--blender", default="blender", help="The Blender executable (or a stand-in for it)")
+    parser.add_argument("--addon-module", default=DEFAULT_ADDON_MODULE, help="The add-on's module name")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="How many Blender processes to run at once")
+    parser.add_argument(
+        "--package",
+        action="append",
+        dest="packages",
+        metavar="LABEL",
+        help="Only export packages with this label. Can be given more than once",
+    )
+    parser.add_argument(
+        "--output-dir",
+        metavar="DIRECTORY",
+        help="Write packages here instead of their own paths. {name} is replaced with the .blend file's name",
+    )
+    parser.add_argument("--threads", type=int, help="Writer threads for each Blender process")
+    parser.add_argument("--chunk-size", type=int, metavar="VERTICES", help="Write records in chunks of this many vertices")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore export caches")
+    parser.add_argument("--timeout", type=float, help="Give up on a job after this many seconds")
+    parser.add_argument("--report", metavar="FILE", help="Save the report here; an existing one is used to skip and order jobs")
+    parser.add_argument("--force", action="store_true", help="Run jobs even if their outputs are up to date")
+
+    args = parser.parse_args(argv)
+
+    if not args.blends and not args.jobs:
+        parser.error("nothing to export: give some .blend files or --jobs")
+
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_arguments(argv)
+    jobs = load_jobs(args)
+    previous = load_previous(args.report)
+
+    for job in jobs:
+        job.previous = previous.get(job.key)
+
+    report = Batch(args, jobs).run()
+    summary = report["summary"]
+
+    print(
+        f"{summary['ok']} exported, {summary['skipped']} up to date, "
+        f"{summary['failed']} failed in {report['seconds']:.1f}s"
+    )
+
+    for entry in report["jobs"]:
+        if entry["status"] == "failed":
+            print(f"  {entry['blend']}: {entry['error']}")
+
+    if args.report:
+        with open(args.report, "w") as file:
+            json.dump(report, file, indent=2)
+
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+Benchmarks the export pipeline without Blender.
+
+    python benchmarks/benchmark.py --objects 4 --vertices 200000 --attributes 8 \
+        --output results.json --compare previous.json
+
+Each stage is timed on its own (best of --repeat runs), then run once more
+under tracemalloc to find its peak memory use. Results are printed and,
+with --output, saved as JSON so that runs from different versions can be
+compared with --compare.
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_bpy
+
+
+def measure(run: Callable[[], int], repeat: int) -> Dict[str, float]:
+    """
+    Times run() and records its peak memory use. run() returns how many
+    bytes it produced. The exporter's progress messages are swallowed.
+    """
+    best = None
+    produced = 0
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            produced = run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        gc.collect()
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {"seconds": best, "output_bytes": produced, "peak_memory_bytes": peak}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=fake_bpy.ADDON_PATH,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmarks(args) -> Dict:
+    export = fake_bpy.install()
+
+    from attribute_exporter.context_managers import EvaluatedMesh
+    from attribute_exporter.writer import Writer, encode_record
+
+    directory = tempfile.mkdtemp(prefix="attribute-exporter-benchmark-")
+
+    context, package = fake_bpy.make_scene(
+        directory,
+        objects=args.objects,
+        vertices=args.vertices,
+        attributes=args.attributes,
+        threads=args.threads,
+        encoding=args.encoding,
+        compression=args.compression,
+        vertex_order=args.vertex_order,
+        instances=args.instances,
+    )
+
+    plan = export.PackageExport(package).plan
+    steps = list(plan.get_steps())
+    settings = export.get_format_settings(package)
+    depsgraph = context.view_layer.depsgraph
+
+    def extract():
+        result = []
+        for step in steps:
+            with EvaluatedMesh(step.obj, depsgraph) as mesh:
+                for attribute in sorted(step.attributes):
+                    result.append((step, attribute, export.read_attribute(step.obj, mesh, attribute)))
+        return result
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        extracted = extract()
+    input_bytes = sum(data.nbytes for _, _, (_, data) in extracted)
+
+    def run_extract():
+        extract()
+        return input_bytes
+
+    def encode():
+        return [
+            (step, attribute, encode_record(attribute, dimensions, data, settings, step.encodings[attribute]))
+            for step, attribute, (dimensions, data) in extracted
+        ]
+
+    encoded = encode()
+
+    def run_encode():
+        return sum(
+            sum(memoryview(buffer).nbytes for buffer in buffers) for _, _, buffers in encode()
+        )
+
+    def run_write():
+        path = os.path.join(directory, "write.attrdata")
+
+        with Writer(path, settings) as writer:
+            writer.write_header([(step.obj.name, sorted(step.attributes)) for step in steps])
+            current = None
+
+            for step, attribute, buffers in encoded:
+                if step is not current:
+                    writer.write_object(step.obj.name, step.source_uv, len(step.attributes))
+                    current = step
+                writer.write_encoded_record(attribute, buffers)
+
+        return os.path.getsize(path)
+
+    def run_export(threads: int, use_cache: bool, chunk_size: int = 0):
+        def run():
+            context.scene.attribute_exporter_threads = threads
+            context.scene.attribute_exporter_chunk_size = chunk_size
+            package.use_cache = use_cache
+            export.perform_export(context, package)
+            return os.path.getsize(os.path.join(directory, package.label + ".attrdata"))
+
+        return run
+
+    stages = {
+        "extract": measure(run_extract, args.repeat),
+        "encode": measure(run_encode, args.repeat),
+        "write": measure(run_write, args.repeat),
+        "export": measure(run_export(0, False), args.repeat),
+        "export_threaded": measure(run_export(args.threads, False), args.repeat),
+        "export_chunked": measure(run_export(0, False, args.chunk_size), args.repeat),
+    }
+
+    # the first run fills the cache, so every measured run is a warm one
+    measure(run_export(0, True), 1)
+    stages["export_cached"] = measure(run_export(0, True), args.repeat)
+
+    plan_packages = fake_bpy.make_plan_packages(
+        directory, objects=args.plan_objects, packages=args.plan_packages, attributes=args.attributes
+    )
+
+    def run_plan():
+        # the same way perform_exports() builds them, sharing one resolver
+        resolver = export.props.ObjectResolver()
+        exports = [export.PackageExport(package, resolver) for package in plan_packages]
+        return sum(len(step.attributes) for item in exports for step in item.plan.get_steps())
+
+    # plan "output" is planned attributes rather than bytes
+    stages["plan"] = measure(run_plan, args.repeat)
+
+    vertex_total = args.objects * args.instances * args.vertices
+
+    for stage in stages.values():
+        seconds = max(stage["seconds"], 1e-9)
+        stage["vertices_per_second"] = vertex_total / seconds
+        stage["input_megabytes_per_second"] = input_bytes / seconds / 1e6
+        stage["output_megabytes_per_second"] = stage["output_bytes"] / seconds / 1e6
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "format_version": settings.version,
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "config": {
+            "objects": args.objects,
+            "vertices": args.vertices,
+            "attributes": args.attributes,
+            "threads": args.threads,
+            "encoding": args.encoding,
+            "compression": args.compression,
+            "vertex_order": args.vertex_order,
+            "instances": args.instances,
+            "chunk_size": args.chunk_size,
+            "plan_objects": args.plan_objects,
+            "plan_packages": args.plan_packages,
+            "repeat": args.repeat,
+        },
+        "stages": stages,
+    }
+
+
+def print_results(results: Dict, previous: Dict = None) -> None:
+    print(f"{'stage':<16}{'seconds':>10}{'Mvert/s':>10}{'in MB/s':>10}{'out MB/s':>10}{'peak MB':>10}")
+
+    for name, stage in results["stages"].items():
+        line = (
+            f"{name:<16}"
+            f"{stage['seconds']:>10.4f}"
+            f"{stage['vertices_per_second'] / 1e6:>10.2f}"
+            f"{stage['input_megabytes_per_second']:>10.1f}"
+            f"{stage['output_megabytes_per_second']:>10.1f}"
+            f"{stage['peak_memory_bytes'] / 1e6:>10.1f}"
+        )
+
+        if previous and name in previous.get("stages", {}):
+            before = previous["stages"][name]["seconds"]
+            line += f"   {before / max(stage['seconds'], 1e-9):.2f}x vs {previous['meta']['revision']}"
+
+        print(line)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, default=4)
+    parser.add_argument("--vertices", type=int, default=100000)
+    parser.add_argument("--attributes", type=int, default=6)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--encoding", default="FLOAT32", choices=["FLOAT32", "FLOAT16", "UNORM8", "UNORM16", "SNORM16"])
+    parser.add_argument("--compression", default="NONE", choices=["NONE", "ZLIB"])
+    parser.add_argument("--vertex-order", default="BLENDER", choices=["BLENDER", "UNITY"])
+    parser.add_argument("--instances", type=int, default=1, help="How many objects share each mesh")
+    parser.add_argument("--chunk-size", type=int, default=65536, help="Vertices per chunk in the chunked export stage")
+    parser.add_argument("--plan-objects", type=int, default=20000, help="Objects in the scene the plan stage plans")
+    parser.add_argument("--plan-packages", type=int, default=4, help="Packages the plan stage plans")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Save the results to this JSON file")
+    parser.add_argument("--compare", help="Compare against results saved by an earlier run")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+
+    print_results(results, previous)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
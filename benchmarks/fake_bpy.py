@@ -0,0 +1,396 @@
+"""
+A tiny stand-in for the parts of bpy that the exporter touches, so that
+the export pipeline can be benchmarked on a machine without Blender.
+
+install() puts fake bpy, bmesh and mathutils modules into sys.modules and
+loads the add-on as a package without running its registration code.
+make_scene() builds synthetic meshes and packages to export.
+"""
+
+import importlib
+import os
+import sys
+import types
+from types import SimpleNamespace
+from typing import List
+
+import numpy
+
+PACKAGE_NAME = "attribute_exporter"
+ADDON_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# data_type -> (foreach_get property, dimensions)
+ATTRIBUTE_TYPES = [
+    ("FLOAT", "value", 1),
+    ("FLOAT_VECTOR", "vector", 3),
+    ("FLOAT_COLOR", "color", 4),
+]
+
+
+class Namespace(types.ModuleType):
+    """
+    Hands out an empty class for any name, so that modules can subclass
+    and annotate with bpy.types.Whatever.
+    """
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        cls = type(name, (), {})
+        setattr(self, name, cls)
+        return cls
+
+
+def fake_property(*args, **kwargs):
+    return None
+
+
+class ArrayData:
+    """
+    A bpy_prop_collection whose items all have the same properties, backed
+    by NumPy arrays.
+    """
+
+    def __init__(self, length: int, **arrays):
+        self.length = length
+        self.arrays = arrays
+
+    def __len__(self):
+        return self.length
+
+    def foreach_get(self, key, out):
+        out[...] = self.arrays[key].reshape(-1)
+
+    def foreach_set(self, key, values):
+        self.arrays[key] = numpy.array(values, copy=True)
+
+
+class Attribute:
+    def __init__(self, name: str, data_type: str, key: str, dimensions: int, count: int, rng):
+        self.name = name
+        self.domain = "POINT"
+        self.data_type = data_type
+        values = rng.random(count * dimensions, dtype=numpy.float32)
+        self.data = ArrayData(count, **{key: values})
+
+
+class Attributes(list):
+    def get(self, name):
+        for attribute in self:
+            if attribute.name == name:
+                return attribute
+        return None
+
+
+class UVLayer:
+    def __init__(self, name: str, loop_count: int):
+        self.name = name
+        self.data = ArrayData(loop_count, uv=numpy.zeros(loop_count * 2, dtype=numpy.float32))
+
+
+class UVLayers(list):
+    def __init__(self, loop_count: int):
+        super().__init__()
+        self.loop_count = loop_count
+
+    def new(self, name: str = "UVMap"):
+        layer = UVLayer(name, self.loop_count)
+        self.append(layer)
+        return layer
+
+
+class Mesh:
+    def __init__(self, name: str, vertex_count: int, attribute_count: int, rng):
+        face_count = max(1, vertex_count // 4)
+        loop_count = face_count * 4
+
+        self.name = name
+        self.vertices = ArrayData(
+            vertex_count, co=rng.random(vertex_count * 3, dtype=numpy.float32)
+        )
+        vertex_index = numpy.arange(loop_count, dtype=numpy.int32) % vertex_count
+        vertex_normals = rng.random((vertex_count, 3), dtype=numpy.float32)
+
+        self.loops = ArrayData(loop_count, vertex_index=vertex_index)
+        # smooth shading: every corner of a vertex shares its normal
+        self.corner_normals = ArrayData(loop_count, vector=vertex_normals[vertex_index].ravel())
+        self.color_attributes = []
+        self.polygons = ArrayData(
+            face_count, loop_total=numpy.full(face_count, 4, dtype=numpy.int32)
+        )
+        self.attributes = Attributes()
+        self.uv_layers = UVLayers(loop_count)
+        self.uv_layers.new()
+        self.shape_keys = None
+        self.library = None
+        self.tagged = False
+
+        for index in range(attribute_count):
+            data_type, key, dimensions = ATTRIBUTE_TYPES[index % len(ATTRIBUTE_TYPES)]
+            self.attributes.append(
+                Attribute(f"Attribute {index}", data_type, key, dimensions, vertex_count, rng)
+            )
+
+    def update_tag(self):
+        self.tagged = True
+
+
+class NodeTree:
+    def __init__(self, name: str):
+        self.name = name
+        self.nodes = []
+        self.links = []
+
+
+class Modifier:
+    """
+    A modifier that doesn't change anything, but still makes the exporter
+    evaluate its object.
+    """
+
+    bl_rna = SimpleNamespace(
+        properties=[
+            SimpleNamespace(identifier=identifier, type=prop_type)
+            for identifier, prop_type in [
+                ("name", "STRING"),
+                ("type", "ENUM"),
+                ("show_render", "BOOLEAN"),
+                ("show_viewport", "BOOLEAN"),
+            ]
+        ]
+    )
+
+    def __init__(self, name: str, modifier_type: str = "SUBSURF"):
+        self.name = name
+        self.type = modifier_type
+        self.show_render = True
+        self.show_viewport = True
+        self.node_group = None
+
+    def keys(self):
+        return []
+
+
+class Object:
+    def __init__(self, name: str, mesh: Mesh):
+        self.name = name
+        self.type = "MESH"
+        self.data = mesh
+        self.modifiers = []
+        self.library = None
+        self.vertex_groups = []
+        self.matrix_world = ((1, 0, 0, 0), (0, 1, 0, 0), (0, 0, 1, 0), (0, 0, 0, 1))
+
+    def visible_get(self):
+        return True
+
+    def evaluated_get(self, depsgraph):
+        return self
+
+    def to_mesh(self, preserve_all_data_layers=False, depsgraph=None):
+        return self.data
+
+    def to_mesh_clear(self):
+        pass
+
+
+class Collection:
+    def __init__(self, name: str, objects: List[Object], children: List["Collection"] = ()):
+        self.name = name
+        self.objects = list(objects)
+        self.children = list(children)
+
+    @property
+    def all_objects(self):
+        # like Blender's, this walks every child collection each time
+        result = dict.fromkeys(self.objects)
+        for child in self.children:
+            result.update(dict.fromkeys(child.all_objects))
+        return list(result)
+
+
+class Entry:
+    def __init__(
+        self, objects: List[Object], attributes: List[str], encoding: str, collections: List[Collection] = ()
+    ):
+        self.objects = [SimpleNamespace(object=obj) for obj in objects]
+        self.collections = [SimpleNamespace(pointer=collection) for collection in collections]
+        self.attributes = [
+            SimpleNamespace(selection=SimpleNamespace(attribute=name), encoding=encoding)
+            for name in attributes
+        ]
+
+    def get_objects(self, resolver=None):
+        props = sys.modules[PACKAGE_NAME + ".props"]
+        return (resolver or props.ObjectResolver()).resolve(self)
+
+
+class Depsgraph:
+    def __init__(self):
+        self.updates = 0
+
+    def update(self):
+        self.updates += 1
+
+
+class ViewLayer:
+    def __init__(self):
+        self.depsgraph = Depsgraph()
+        self.updates = 0
+
+    def update(self):
+        self.updates += 1
+
+
+def install():
+    """
+    Installs the fake modules and returns the add-on's export module.
+    """
+    bpy = types.ModuleType("bpy")
+    bpy.types = Namespace("bpy.types")
+    bpy.props = SimpleNamespace(
+        BoolProperty=fake_property,
+        CollectionProperty=fake_property,
+        EnumProperty=fake_property,
+        FloatProperty=fake_property,
+        IntProperty=fake_property,
+        PointerProperty=fake_property,
+        StringProperty=fake_property,
+        _PropertyDeferred=type("_PropertyDeferred", (), {}),
+    )
+    bpy.path = SimpleNamespace(abspath=lambda path: path)
+    bpy.app = types.ModuleType("bpy.app")
+    bpy.app.version = (4, 0, 0)
+    bpy.app.background = True
+    bpy.app.handlers = types.ModuleType("bpy.app.handlers")
+    bpy.app.handlers.persistent = lambda function: function
+    bpy.app.handlers.depsgraph_update_post = []
+    bpy.app.handlers.load_post = []
+    bpy.data = SimpleNamespace(libraries={})
+    bpy.context = None
+
+    sys.modules["bpy"] = bpy
+    sys.modules["bpy.app"] = bpy.app
+    sys.modules["bpy.app.handlers"] = bpy.app.handlers
+    sys.modules["bmesh"] = types.ModuleType("bmesh")
+
+    mathutils = types.ModuleType("mathutils")
+    mathutils.Vector = tuple
+    sys.modules["mathutils"] = mathutils
+
+    package = types.ModuleType(PACKAGE_NAME)
+    package.__path__ = [ADDON_PATH]
+    sys.modules[PACKAGE_NAME] = package
+
+    return importlib.import_module(PACKAGE_NAME + ".export")
+
+
+def make_scene(
+    directory: str,
+    objects: int,
+    vertices: int,
+    attributes: int,
+    threads: int = 0,
+    encoding: str = "FLOAT32",
+    compression: str = "NONE",
+    use_cache: bool = False,
+    vertex_order: str = "BLENDER",
+    instances: int = 1,
+    seed: int = 0,
+):
+    """
+    Builds a context and a single package that exports every attribute
+    of every synthetic object. Each mesh is shared by instances objects.
+    """
+    rng = numpy.random.default_rng(seed)
+
+    meshes = [Mesh(f"Mesh {index}", vertices, attributes, rng) for index in range(objects)]
+    scene_objects = [
+        Object(f"Object {index}" + (f".{copy:03}" if copy else ""), mesh)
+        for index, mesh in enumerate(meshes)
+        for copy in range(instances)
+    ]
+
+    names = [f"Attribute {index}" for index in range(attributes)]
+
+    package = SimpleNamespace(
+        label="Benchmark",
+        path=directory,
+        entries=[Entry(scene_objects, names, encoding)],
+        source_uv="1",
+        default_vertex_storage="BAKED",
+        format_version="CURRENT",
+        compression=compression,
+        compression_level=6,
+        byte_shuffle=True,
+        use_cache=use_cache,
+        vertex_order=vertex_order,
+    )
+
+    return make_context(threads), package
+
+
+def make_context(threads: int = 0):
+    view_layer = ViewLayer()
+    context = SimpleNamespace(
+        scene=SimpleNamespace(
+            toggled_geonode_trees=[],
+            frame_current=1,
+            attribute_exporter_scoped_evaluation=False,
+            attribute_exporter_threads=threads,
+            attribute_exporter_chunk_size=0,
+        ),
+        view_layer=view_layer,
+        evaluated_depsgraph_get=lambda: view_layer.depsgraph,
+    )
+
+    return context
+
+
+def make_plan_packages(directory: str, objects: int, packages: int, attributes: int, seed: int = 0):
+    """
+    Builds packages that only exist to be planned: many empty objects in
+    nested collections, which every package's entries refer to several
+    times over, both directly and through their collections.
+    """
+    rng = numpy.random.default_rng(seed)
+
+    scene_objects = [Object(f"Object {index}", None) for index in range(objects)]
+    leaves = [
+        Collection(f"Leaf {index}", scene_objects[start : start + 50])
+        for index, start in enumerate(range(0, objects, 50))
+    ]
+    groups = [
+        Collection(f"Group {index}", [], leaves[start : start + 8])
+        for index, start in enumerate(range(0, len(leaves), 8))
+    ]
+    root = Collection("Root", [], groups)
+
+    names = [f"Attribute {index}" for index in range(attributes)]
+    result = []
+
+    for index in range(packages):
+        # each entry exports its own attribute, so overlapping entries are fine
+        entries = [
+            Entry([], names[:1], "FLOAT32", [root]),
+            Entry(list(rng.choice(scene_objects, objects // 10, replace=False)), names[1:2], "FLOAT32", groups),
+            Entry([], names[2:], "FLOAT32", leaves),
+        ]
+
+        result.append(
+            SimpleNamespace(
+                label=f"Plan {index}",
+                path=directory,
+                entries=entries,
+                source_uv="1",
+                default_vertex_storage="BAKED",
+                format_version="CURRENT",
+                compression="NONE",
+                compression_level=6,
+                byte_shuffle=True,
+                use_cache=False,
+                vertex_order="BLENDER",
+            )
+        )
+
+    return result
@@ -0,0 +1,454 @@
+import hashlib
+import os
+import struct
+from typing import BinaryIO, Dict, List, NamedTuple, Optional
+
+import bpy
+import numpy
+
+from .writer import RecordLocation
+
+# Blobs are stored back to back, followed by an index and a trailer that
+# points at the index:
+#
+#   magic | blob... | package digest, count, entries... | index offset, magic
+#
+# Each entry also remembers where the object's records sit inside its
+# blob, so that the table of contents can be filled in for copied objects.
+MAGIC = b"ATTRCAC2"
+DEFAULT_SIZE_LIMIT = 256 * 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# How to read each attribute type in bulk when fingerprinting a mesh:
+# (foreach_get property, components, dtype)
+FINGERPRINT_TYPES = {
+    "FLOAT": ("value", 1, numpy.float32),
+    "INT": ("value", 1, numpy.int32),
+    "INT8": ("value", 1, numpy.int8),
+    "BOOLEAN": ("value", 1, numpy.bool_),
+    "FLOAT2": ("vector", 2, numpy.float32),
+    "FLOAT_VECTOR": ("vector", 3, numpy.float32),
+    "FLOAT_COLOR": ("color", 4, numpy.float32),
+    "BYTE_COLOR": ("color", 4, numpy.float32),
+}
+
+# Node properties that only affect how the node editor looks.
+IGNORED_NODE_PROPERTIES = {
+    "rna_type", "name", "label", "location", "width", "height", "dimensions",
+    "select", "hide", "mute", "show_options", "show_preview", "show_texture",
+    "use_custom_color", "color", "parent", "bl_width_default", "bl_width_min",
+    "bl_width_max", "bl_height_default", "bl_height_min", "bl_height_max",
+}
+
+
+class CacheEntry(NamedTuple):
+    digest: bytes
+    offset: int
+    length: int
+    records: List[RecordLocation]
+
+
+def plain(value):
+    """
+    Turns a Blender property value into something with a stable repr.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, bpy.types.ID):
+        return value.name
+    if hasattr(value, "to_list"):
+        return value.to_list()
+
+    try:
+        return tuple(plain(item) for item in value)
+    except TypeError:
+        return repr(value)
+
+
+class Fingerprint:
+    """
+    Hashes everything that can change an object's exported attributes
+    without evaluating it: the mesh itself, its modifier stack, and the
+    geometry node trees that stack uses.
+
+    Changes to other objects that a node tree reads from (through an
+    Object Info node, for example) are not picked up.
+
+    Vertex weights can only reach exported attributes through modifiers,
+    and reading them means visiting every vertex, so they're only hashed
+    when asked for.
+
+    The source UV map and the vertex ID modifier are left out: they only
+    ever hold vertex IDs, which the export puts there itself.
+    """
+
+    digest: "hashlib._Hash"
+
+    def __init__(self):
+        self.digest = hashlib.sha1()
+
+    def update(self, *values) -> None:
+        self.digest.update(repr(values).encode("utf-8"))
+
+    def update_array(self, collection, key: str, components: int, dtype) -> None:
+        data = numpy.empty(len(collection) * components, dtype=dtype)
+        collection.foreach_get(key, data)
+        self.digest.update(data.data)
+
+    def update_rna(self, data, ignored=frozenset(("rna_type",))) -> None:
+        for prop in data.bl_rna.properties:
+            if prop.identifier in ignored or prop.type == "COLLECTION":
+                continue
+
+            self.update(prop.identifier, plain(getattr(data, prop.identifier, None)))
+
+    def update_tree(self, tree: bpy.types.NodeTree, seen: set) -> None:
+        if tree is None or tree.name in seen:
+            return
+
+        seen.add(tree.name)
+        self.update(tree.name)
+
+        for node in tree.nodes:
+            self.update(node.name, node.bl_idname, node.mute)
+            self.update_rna(node, IGNORED_NODE_PROPERTIES)
+
+            for socket in node.inputs:
+                if hasattr(socket, "default_value"):
+                    self.update(socket.identifier, plain(socket.default_value))
+
+            self.update_tree(getattr(node, "node_tree", None), seen)
+
+        for link in tree.links:
+            self.update(
+                link.from_node.name,
+                link.from_socket.identifier,
+                link.to_node.name,
+                link.to_socket.identifier,
+                link.is_muted,
+            )
+
+    def update_object(
+        self,
+        obj: bpy.types.Object,
+        weights: bool = True,
+        source_uv: Optional[int] = None,
+        vertex_tree: Optional[bpy.types.NodeTree] = None,
+    ) -> None:
+        mesh = obj.data
+
+        self.update(obj.name, mesh.name, [tuple(row) for row in obj.matrix_world])
+
+        self.update(len(mesh.vertices), len(mesh.loops), len(mesh.polygons))
+        self.update_array(mesh.vertices, "co", 3, numpy.float32)
+        self.update_array(mesh.loops, "vertex_index", 1, numpy.int32)
+        self.update_array(mesh.polygons, "loop_total", 1, numpy.int32)
+
+        for attribute in mesh.attributes:
+            if attribute.name.startswith("."):
+                continue
+
+            self.update(attribute.name, attribute.domain, attribute.data_type)
+
+            if attribute.data_type in FINGERPRINT_TYPES:
+                key, components, dtype = FINGERPRINT_TYPES[attribute.data_type]
+                self.update_array(attribute.data, key, components, dtype)
+
+        for index, layer in enumerate(mesh.uv_layers):
+            if index == source_uv:
+                continue
+
+            self.update(layer.name)
+            self.update_array(layer.data, "uv", 2, numpy.float32)
+
+        if obj.vertex_groups:
+            self.update([group.name for group in obj.vertex_groups])
+
+        if obj.vertex_groups and weights:
+            for vertex in mesh.vertices:
+                self.update([(group.group, group.weight) for group in vertex.groups])
+
+        if mesh.shape_keys:
+            self.update(obj.active_shape_key_index, obj.show_only_shape_key)
+
+            for key_block in mesh.shape_keys.key_blocks:
+                self.update(key_block.name, key_block.value, key_block.mute)
+                self.update_array(key_block.data, "co", 3, numpy.float32)
+
+        seen = set()
+
+        for modifier in obj.modifiers:
+            if modifier.type == "NODES" and vertex_tree is not None and modifier.node_group == vertex_tree:
+                continue
+
+            self.update_rna(modifier)
+
+            if modifier.type == "NODES":
+                for key in modifier.keys():
+                    self.update(key, plain(modifier[key]))
+
+                self.update_tree(modifier.node_group, seen)
+
+    def finish(self) -> bytes:
+        return self.digest.digest()
+
+
+def fingerprint(
+    obj: bpy.types.Object,
+    *settings,
+    weights: bool = True,
+    source_uv: Optional[int] = None,
+    vertex_tree: Optional[bpy.types.NodeTree] = None,
+) -> bytes:
+    result = Fingerprint()
+    result.update(*settings)
+    result.update_object(obj, weights, source_uv, vertex_tree)
+    return result.finish()
+
+
+def read_string(file: BinaryIO) -> str:
+    (length,) = struct.unpack("<I", file.read(4))
+    return file.read(length).decode("utf-8")
+
+
+def write_string(file: BinaryIO, value: str) -> None:
+    encoded = value.encode("utf-8")
+    file.write(struct.pack("<I", len(encoded)))
+    file.write(encoded)
+
+
+def copy_range(source: BinaryIO, write, offset: int, length: int) -> None:
+    source.seek(offset)
+
+    while length > 0:
+        chunk = source.read(min(length, COPY_CHUNK_SIZE))
+        if not chunk:
+            raise IOError("The export cache is truncated.")
+        write(chunk)
+        length -= len(chunk)
+
+
+class Store:
+    """
+    Mirrors everything a Writer produces into the cache between begin()
+    and end(). Objects that would take the cache past its size limit
+    aren't kept.
+    """
+
+    cache: "ExportCache"
+    name: str
+    digest: bytes
+    writer: object
+    offset: Optional[int]
+
+    def __init__(self, cache: "ExportCache", name: str, digest: bytes, writer):
+        self.cache = cache
+        self.name = name
+        self.digest = digest
+        self.writer = writer
+        self.offset = None
+
+    def begin(self) -> None:
+        self.cache.open()
+
+        if self.cache.get_stored_size() >= self.cache.size_limit:
+            return
+
+        self.offset = self.cache.file.tell()
+        self.writer.tee = self.cache.file
+
+    def end(self) -> None:
+        if self.offset is None:
+            return
+
+        self.writer.tee = None
+
+        if self.cache.get_stored_size() > self.cache.size_limit:
+            # it didn't fit after all, so it's forgotten again
+            self.cache.file.seek(self.offset)
+            self.cache.file.truncate()
+            return
+
+        obj = self.writer.objects[-1]
+        records = [
+            RecordLocation(record.name, record.offset - obj.offset, record.length)
+            for record in obj.records
+        ]
+
+        length = self.cache.file.tell() - self.offset
+        self.cache.stored[self.name] = CacheEntry(self.digest, self.offset, length, records)
+        self.cache.used.append(self.name)
+
+
+class ExportCache:
+    """
+    A sidecar file that remembers the encoded object blocks from the last
+    export of a package, so that objects that haven't changed can be
+    copied straight into the next export without being evaluated.
+
+    The objects stored or copied most recently are kept, as long as they
+    fit in the size limit; the limit applies to the bytes actually written.
+    """
+
+    path: str
+    size_limit: int
+    package_digest: bytes
+    previous_digest: bytes
+    entries: Dict[str, CacheEntry]
+    stored: Dict[str, CacheEntry]
+    used: List[str]
+    hits: int
+    misses: int
+    source: Optional[BinaryIO]
+    file: Optional[BinaryIO]
+
+    def __init__(self, path: str, size_limit: int = DEFAULT_SIZE_LIMIT):
+        self.path = path
+        self.size_limit = size_limit
+        self.package_digest = b""
+        self.previous_digest = b""
+        self.entries = {}
+        self.stored = {}
+        self.used = []
+        self.hits = 0
+        self.misses = 0
+        self.source = None
+        self.file = None
+
+    def __enter__(self) -> "ExportCache":
+        self.load()
+        return self
+
+    def __exit__(self, exc_type, *args):
+        try:
+            if exc_type is None:
+                self.save()
+        finally:
+            if self.source:
+                self.source.close()
+            if self.file:
+                self.file.close()
+                if exc_type is not None:
+                    os.remove(self.path + ".tmp")
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+
+        self.source = open(self.path, "rb")
+
+        try:
+            self.source.seek(-16, os.SEEK_END)
+            index_offset, magic = struct.unpack("<Q8s", self.source.read(16))
+
+            if magic != MAGIC:
+                raise ValueError("Not an export cache.")
+
+            self.source.seek(index_offset)
+            self.package_digest = self.source.read(20)
+            (count,) = struct.unpack("<I", self.source.read(4))
+
+            for _ in range(count):
+                name = read_string(self.source)
+                digest = self.source.read(20)
+                offset, length, record_count = struct.unpack("<QQI", self.source.read(20))
+                records = []
+
+                for _ in range(record_count):
+                    record_name = read_string(self.source)
+                    record_offset, record_length = struct.unpack("<QQ", self.source.read(16))
+                    records.append(RecordLocation(record_name, record_offset, record_length))
+
+                self.entries[name] = CacheEntry(digest, offset, length, records)
+
+            self.previous_digest = self.package_digest
+        except (OSError, ValueError, struct.error, UnicodeDecodeError):
+            print("Ignoring an unreadable export cache: " + self.path)
+            self.package_digest = b""
+            self.entries = {}
+
+    def is_fresh(self, name: str, digest: bytes) -> bool:
+        entry = self.entries.get(name)
+        fresh = entry is not None and entry.digest == digest
+
+        if fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        return fresh
+
+    def copy(self, name: str, writer) -> None:
+        entry = self.entries[name]
+        writer.write_copied_object(name, entry.records)
+        copy_range(self.source, writer.write_bytes, entry.offset, entry.length)
+        self.used.append(name)
+
+    def store(self, name: str, digest: bytes, writer) -> Store:
+        return Store(self, name, digest, writer)
+
+    def open(self) -> None:
+        if self.file is None:
+            self.file = open(self.path + ".tmp", "wb")
+            self.file.write(MAGIC)
+
+    def get_stored_size(self) -> int:
+        """
+        How many bytes of objects have been written to the new cache.
+        """
+        return self.file.tell() - len(MAGIC)
+
+    def save(self) -> None:
+        if self.file is None and self.package_digest == self.previous_digest:
+            return
+
+        self.open()
+
+        # stored objects are already in the file; then the ones that were
+        # used most recently, then whatever is left over from before, as
+        # long as they still fit
+        order = list(dict.fromkeys(self.used + list(self.entries)))
+        index = []
+        total = self.get_stored_size()
+
+        for name in order:
+            if name in self.stored:
+                index.append((name, self.stored[name]))
+                continue
+
+            entry = self.entries[name]
+
+            if total + entry.length > self.size_limit:
+                continue
+
+            total += entry.length
+            offset = self.file.tell()
+            copy_range(self.source, self.file.write, entry.offset, entry.length)
+            index.append((name, entry._replace(offset=offset)))
+
+        index_offset = self.file.tell()
+
+        self.file.write(self.package_digest.ljust(20, b"\x00"))
+        self.file.write(struct.pack("<I", len(index)))
+
+        for name, entry in index:
+            write_string(self.file, name)
+            self.file.write(entry.digest)
+            self.file.write(struct.pack("<QQI", entry.offset, entry.length, len(entry.records)))
+
+            for record in entry.records:
+                write_string(self.file, record.name)
+                self.file.write(struct.pack("<QQ", record.offset, record.length))
+
+        self.file.write(struct.pack("<Q8s", index_offset, MAGIC))
+        self.file.close()
+        self.file = None
+
+        if self.source:
+            self.source.close()
+            self.source = None
+
+        os.replace(self.path + ".tmp", self.path)
+
+    def describe(self) -> str:
+        return f"{self.hits} cached, {self.misses} exported"
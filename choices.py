@@ -0,0 +1,94 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+import bpy
+from bpy.app.handlers import persistent
+
+from .discovery import AttributeInfo
+
+
+class AttributeChoiceCache:
+    """
+    Remembers which attributes each object has, so that clicking through
+    packages and entries doesn't evaluate anything.
+
+    Objects are remembered by pointer, along with their mesh's pointer, so
+    that an update to either one forgets them. Pointers don't survive
+    loading a file, so everything is forgotten then too.
+
+    A deleted object's pointer can be handed to a new one, and deleting
+    doesn't show up as a geometry update, so each object's name, session
+    UID and mesh are remembered too, and have to match when it's looked up.
+    """
+
+    attributes: Dict[int, List[AttributeInfo]]
+    dependencies: Dict[int, Set[int]]
+    identities: Dict[int, Tuple[str, Optional[int], int]]
+
+    def __init__(self):
+        self.attributes = {}
+        self.dependencies = {}
+        self.identities = {}
+
+    @staticmethod
+    def identify(obj: bpy.types.Object) -> Tuple[str, Optional[int], int]:
+        # older versions of Blender don't have session_uid
+        return obj.name_full, getattr(obj, "session_uid", None), obj.data.as_pointer()
+
+    def get(self, obj: bpy.types.Object) -> Optional[List[AttributeInfo]]:
+        key = obj.as_pointer()
+
+        if self.identities.get(key) != self.identify(obj):
+            return None
+
+        return self.attributes[key]
+
+    def store(self, obj: bpy.types.Object, attributes: List[AttributeInfo]) -> None:
+        key = obj.as_pointer()
+
+        self.attributes[key] = list(attributes)
+        self.dependencies[key] = {key, obj.data.as_pointer()}
+        self.identities[key] = self.identify(obj)
+
+    def invalidate(self, id: bpy.types.ID) -> None:
+        pointer = id.as_pointer()
+
+        for key, dependencies in list(self.dependencies.items()):
+            if pointer in dependencies:
+                del self.attributes[key]
+                del self.dependencies[key]
+                del self.identities[key]
+
+    def clear(self) -> None:
+        self.attributes.clear()
+        self.dependencies.clear()
+        self.identities.clear()
+
+
+cache = AttributeChoiceCache()
+
+
+@persistent
+def invalidate_attribute_choices(scene: bpy.types.Scene, depsgraph: bpy.types.Depsgraph) -> None:
+    if not cache.attributes:
+        return
+
+    for update in depsgraph.updates:
+        # moving things around doesn't change their attributes
+        if update.is_updated_geometry:
+            cache.invalidate(update.id.original)
+
+
+@persistent
+def clear_attribute_choices(*args) -> None:
+    cache.clear()
+
+
+def register():
+    bpy.app.handlers.depsgraph_update_post.append(invalidate_attribute_choices)
+    bpy.app.handlers.load_post.append(clear_attribute_choices)
+
+
+def unregister():
+    bpy.app.handlers.depsgraph_update_post.remove(invalidate_attribute_choices)
+    bpy.app.handlers.load_post.remove(clear_attribute_choices)
+    cache.clear()
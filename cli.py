@@ -0,0 +1,228 @@
+"""
+Exports packages without the UI, for build machines:
+
+    blender -b scene.blend --python-expr "import attribute_exporter.cli as cli; cli.main()" \
+        -- --package Character --output-dir /builds/attributes
+
+Everything after "--" is read by this module; run with -- --help to see
+every option. Without --package, every package in the scene is exported.
+
+A single line of JSON describing what was exported is printed to stdout
+(and saved with --report), so that it can be picked out of Blender's own
+output. Blender exits with 1 if the export failed (a missing attribute,
+say), 2 if the arguments were wrong, and 3 if something unexpected went
+wrong.
+"""
+
+import argparse
+import json
+import os
+import sys
+import traceback
+from typing import Dict, List, Optional
+
+import bpy
+
+from . import library
+from .export import PackageExport, perform_exports
+from .profiler import Profiler
+
+
+def get_arguments(argv: Optional[List[str]]) -> List[str]:
+    if argv is not None:
+        return argv
+    if "--" in sys.argv:
+        return sys.argv[sys.argv.index("--") + 1 :]
+    return []
+
+
+def parse_arguments(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="attribute_exporter.cli",
+        description="Export attribute packages from a .blend file.",
+    )
+    parser.add_argument(
+        "--package",
+        action="append",
+        dest="packages",
+        metavar="LABEL",
+        help="Only export the package with this label. Can be given more than once",
+    )
+    parser.add_argument(
+        "--output-dir",
+        metavar="DIRECTORY",
+        help="Write every package to this directory instead of its own path",
+    )
+    parser.add_argument(
+        "--path",
+        action="append",
+        dest="paths",
+        default=[],
+        metavar="LABEL=DIRECTORY",
+        help="Write one package to a different directory. Can be given more than once",
+    )
+    parser.add_argument("--threads", type=int, help="How many writer threads to use")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        metavar="VERTICES",
+        help="Encode and write records this many vertices at a time, to bound memory use",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Ignore export caches and rewrite everything")
+    parser.add_argument("--scoped", action="store_true", help="Only evaluate exported objects")
+    parser.add_argument("--profile", action="store_true", help="Time every phase of the export")
+    parser.add_argument("--trace", metavar="FILE", help="Save a Chrome trace of the export (implies --profile)")
+    parser.add_argument("--report", metavar="FILE", help="Also save the JSON result to this file")
+    parser.add_argument("--list", action="store_true", help="List the scene's packages and exit")
+
+    return parser.parse_args(argv)
+
+
+def resolve_directory(path: str) -> str:
+    """
+    Paths starting with // stay relative to the .blend file, like they are
+    everywhere else in Blender; other relative paths are relative to the
+    working directory.
+    """
+    if path.startswith("//"):
+        return path
+    return os.path.abspath(path)
+
+
+def select_packages(scene: bpy.types.Scene, labels: Optional[List[str]]) -> List:
+    packages = list(scene.attribute_exporter_packages)
+
+    if not labels:
+        return packages
+
+    by_label = {package.label: package for package in packages}
+    missing = [label for label in labels if label not in by_label]
+
+    if missing:
+        raise ValueError(f"Unknown package: {', '.join(missing)}")
+
+    return [by_label[label] for label in dict.fromkeys(labels)]
+
+
+def apply_overrides(args: argparse.Namespace, packages: List) -> None:
+    directories = {}
+
+    if args.output_dir:
+        for package in packages:
+            directories[package.label] = args.output_dir
+
+    for override in args.paths:
+        label, separator, directory = override.partition("=")
+
+        if not separator or not directory:
+            raise ValueError(f"Bad --path: {override} should look like LABEL=DIRECTORY")
+        if label not in {package.label for package in packages}:
+            raise ValueError(f"Bad --path: {label} isn't being exported")
+
+        directories[label] = directory
+
+    for package in packages:
+        if package.label in directories:
+            package.path = resolve_directory(directories[package.label])
+
+        if args.no_cache:
+            package.use_cache = False
+
+        os.makedirs(bpy.path.abspath(package.path), exist_ok=True)
+
+
+def describe(export: PackageExport) -> Dict:
+    result = {
+        "label": export.package.label,
+        "path": export.filepath,
+        "objects": export.plan.get_object_count(),
+        "written": export.writer is not None,
+        "bytes": os.path.getsize(export.filepath) if os.path.exists(export.filepath) else 0,
+    }
+
+    if export.cache:
+        result["cached"] = export.cache.hits
+        result["exported"] = export.cache.misses
+    else:
+        result["cached"] = 0
+        result["exported"] = result["objects"]
+
+    return result
+
+
+def run(args: argparse.Namespace) -> Dict:
+    context = bpy.context
+    scene = context.scene
+
+    if args.list:
+        return {"packages": [package.label for package in scene.attribute_exporter_packages]}
+
+    if not library.library_exists():
+        library.link_library()
+
+    packages = select_packages(scene, args.packages)
+    apply_overrides(args, packages)
+
+    if args.threads is not None:
+        scene.attribute_exporter_threads = args.threads
+    if args.chunk_size is not None:
+        scene.attribute_exporter_chunk_size = args.chunk_size
+    if args.scoped:
+        scene.attribute_exporter_scoped_evaluation = True
+
+    profiler = Profiler(enabled=args.profile or bool(args.trace))
+
+    with profiler:
+        exports = perform_exports(context, packages, profiler)
+
+    result = {"packages": [describe(export) for export in exports]}
+
+    if profiler.enabled:
+        result["profile"] = {
+            "seconds": profiler.total_time,
+            "bytes_written": profiler.bytes_written,
+            "peak_memory": profiler.peak_memory,
+            "phases": dict(profiler.totals()),
+        }
+
+        if args.trace:
+            profiler.save_trace(args.trace)
+
+    return result
+
+
+def output(args: argparse.Namespace, result: Dict) -> None:
+    result = {"blend": bpy.data.filepath, **result}
+    text = json.dumps(result)
+
+    print(text)
+
+    if args.report:
+        with open(args.report, "w") as file:
+            file.write(text + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Runs the export and exits Blender with a status code. argv defaults to
+    whatever came after "--" on Blender's command line.
+    """
+    args = parse_arguments(get_arguments(argv))
+
+    if not hasattr(bpy.types.Scene, "attribute_exporter_packages"):
+        import addon_utils
+
+        addon_utils.enable(__package__)
+
+    try:
+        result = run(args)
+    except ValueError as e:
+        output(args, {"error": str(e)})
+        sys.exit(1)
+    except Exception as e:
+        traceback.print_exc()
+        output(args, {"error": f"{type(e).__name__}: {e}"})
+        sys.exit(3)
+
+    output(args, {"error": None, **result})
+    sys.exit(0)
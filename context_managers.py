@@ -1,40 +1,119 @@
-from typing import List
+from typing import List, Optional, Tuple
 
 import bpy
 
 
 class EnsureGeonodes:
     """
-    Geometry Node modifiers must be shown so that they show up in the
-    bmesh data. However, exporting a model with any of these modifiers
-    enabled causes shape keys to be lost.
+    Geometry Node modifiers must be shown so that the attributes they
+    write show up in the evaluated meshes. However, exporting a model with
+    any of these modifiers enabled causes shape keys to be lost.
 
     This context manager is used to enable all relevant modifiers before
-    doing something, and to then disable them again afterwards.
+    doing something, and to then put them back the way they were afterwards.
+    Only modifiers that actually need to change are touched, and the scene
+    is only updated if something changed.
     """
 
     objects: List[bpy.types.Object]
     context: bpy.types.Context
+    view_layer: bpy.types.ViewLayer
+    changed: List[Tuple[bpy.types.Modifier, bool, bool]]
 
-    def __init__(self, context: bpy.types.Context, objects: List[bpy.types.Object]):
+    def __init__(
+        self,
+        context: bpy.types.Context,
+        objects: List[bpy.types.Object],
+        view_layer: Optional[bpy.types.ViewLayer] = None,
+    ):
         self.objects = []
         self.context = context
+        self.view_layer = view_layer or context.view_layer
+        self.changed = []
 
         for obj in objects:
             self.objects.append(obj)
 
     def __enter__(self):
-        self.set_geonodes(True)
-        self.context.view_layer.update()
+        trees = {item.tree for item in self.context.scene.toggled_geonode_trees if item.tree}
+
+        for obj in self.objects:
+            for modifier in obj.modifiers:
+                if modifier.type != "NODES" or modifier.node_group not in trees:
+                    continue
+
+                if modifier.show_render and modifier.show_viewport:
+                    continue
+
+                self.changed.append((modifier, modifier.show_render, modifier.show_viewport))
+                modifier.show_render = True
+                modifier.show_viewport = True
+
+        if self.changed:
+            self.view_layer.update()
 
     def __exit__(self, *args):
-        self.set_geonodes(False)
-        self.context.view_layer.update()
+        for modifier, show_render, show_viewport in self.changed:
+            modifier.show_render = show_render
+            modifier.show_viewport = show_viewport
+
+        if self.changed:
+            self.view_layer.update()
+
+        self.changed = []
+
+
+class EvaluatedMesh:
+    """
+    Gives temporary access to an object's evaluated mesh, with every
+    modifier applied and every attribute layer kept.
+
+    The mesh is only valid inside the with block; it is cleared again
+    on exit so that we don't leak a copy of it.
+    """
+
+    obj: bpy.types.Object
+    depsgraph: bpy.types.Depsgraph
+
+    def __init__(self, obj: bpy.types.Object, depsgraph: bpy.types.Depsgraph):
+        self.obj = obj.evaluated_get(depsgraph)
+        self.depsgraph = depsgraph
+
+    def __enter__(self) -> bpy.types.Mesh:
+        return self.obj.to_mesh(preserve_all_data_layers=True, depsgraph=self.depsgraph)
+
+    def __exit__(self, *args):
+        self.obj.to_mesh_clear()
+
+
+class ScopedEvaluation:
+    """
+    Evaluates a handful of objects without touching the rest of the scene.
+
+    The objects are linked into a temporary scene, whose view layer only
+    contains them and whatever they depend on. Updating that view layer
+    doesn't re-evaluate unrelated (and possibly very expensive) objects
+    in the user's scene.
+    """
+
+    context: bpy.types.Context
+    objects: List[bpy.types.Object]
+    scene: Optional[bpy.types.Scene]
+
+    def __init__(self, context: bpy.types.Context, objects: List[bpy.types.Object]):
+        self.context = context
+        self.objects = list(objects)
+        self.scene = None
+
+    def __enter__(self) -> bpy.types.ViewLayer:
+        self.scene = bpy.data.scenes.new("Attribute Exporter Evaluation")
+        self.scene.frame_current = self.context.scene.frame_current
 
-    def set_geonodes(self, state: bool):
         for obj in self.objects:
-            for modifier in obj.modifiers:
-                for tree in self.context.scene.toggled_geonode_trees:
-                    if modifier.type == "NODES" and modifier.node_group == tree.tree:
-                        modifier.show_render = state
-                        modifier.show_viewport = state
\ No newline at end of file
+            self.scene.collection.objects.link(obj)
+
+        return self.scene.view_layers[0]
+
+    def __exit__(self, *args):
+        bpy.data.scenes.remove(self.scene)
+        self.scene = None
@@ -0,0 +1,92 @@
+from typing import Dict, Iterable, List, NamedTuple
+
+import bpy
+
+from .context_managers import EnsureGeonodes
+
+# The attribute types we know how to export, and how to read them
+# in bulk: (foreach_get property, dimensions)
+ATTRIBUTE_TYPES = {
+    "FLOAT_COLOR": ("color", 4),
+    "FLOAT_VECTOR": ("vector", 3),
+    "FLOAT": ("value", 1),
+}
+
+
+class AttributeInfo(NamedTuple):
+    name: str
+    domain: str
+    data_type: str
+    size: int
+
+    @property
+    def exportable(self) -> bool:
+        """
+        Whether this is a per-vertex attribute of a type we can export.
+        Internal attributes (whose names start with a dot) never are.
+        """
+        return (
+            self.domain == "POINT"
+            and self.data_type in ATTRIBUTE_TYPES
+            and not self.name.startswith(".")
+        )
+
+    @property
+    def dimensions(self) -> int:
+        return ATTRIBUTE_TYPES[self.data_type][1]
+
+
+def describe_attribute(attribute: bpy.types.Attribute) -> AttributeInfo:
+    return AttributeInfo(attribute.name, attribute.domain, attribute.data_type, len(attribute.data))
+
+
+def describe_attributes(mesh: bpy.types.Mesh) -> List[AttributeInfo]:
+    """
+    Lists a mesh's attributes without reading any of their values.
+    """
+    return [describe_attribute(attribute) for attribute in mesh.attributes]
+
+
+def discover_attributes(
+    objects: Iterable[bpy.types.Object], depsgraph: bpy.types.Depsgraph
+) -> Dict[bpy.types.Object, List[AttributeInfo]]:
+    """
+    Lists the attributes every object ends up with once its modifiers are
+    applied. The evaluated mesh is looked at in place rather than copied.
+    """
+    result = {}
+
+    for obj in objects:
+        evaluated = obj.evaluated_get(depsgraph)
+        result[obj] = describe_attributes(evaluated.data)
+
+    return result
+
+
+def discover_in_scene(
+    context: bpy.types.Context, objects: List[bpy.types.Object]
+) -> Dict[bpy.types.Object, List[AttributeInfo]]:
+    """
+    Like discover_attributes(), but turns on the geometry nodes that only
+    run while exporting first, so that their attributes show up too.
+    """
+    with EnsureGeonodes(context, objects):
+        return discover_attributes(objects, context.evaluated_depsgraph_get())
+
+
+def exportable_names(attributes: Iterable[List[AttributeInfo]]) -> List[str]:
+    """
+    Every exportable attribute name across several objects, without
+    duplicates: colors first, then vectors, then floats, like Blender
+    lists them.
+    """
+    names = {data_type: [] for data_type in ATTRIBUTE_TYPES}
+    seen = set()
+
+    for infos in attributes:
+        for info in infos:
+            if info.exportable and info.name not in seen:
+                names[info.data_type].append(info.name)
+                seen.add(info.name)
+
+    return [name for group in names.values() for name in group]
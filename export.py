@@ -1,31 +1,83 @@
-import struct
+import hashlib
 import os.path
-from typing import Dict, Iterator, List, Tuple
+from contextlib import ExitStack
+from functools import partial
+from types import MappingProxyType
+from typing import Dict, Hashable, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
 
-import bmesh
 import bpy
-from mathutils import Vector
+import numpy
 
 from . import props, library
-from .context_managers import EnsureGeonodes
+from .cache import ExportCache, fingerprint
+from .context_managers import EnsureGeonodes, EvaluatedMesh, ScopedEvaluation
+from .discovery import (
+    ATTRIBUTE_TYPES,
+    AttributeInfo,
+    describe_attribute,
+    describe_attributes,
+    discover_attributes,
+)
+from .pipeline import Pipeline
+from .profiler import Profiler
+from .writer import (
+    COMPRESSION_NONE,
+    COMPRESSION_ZLIB,
+    ENCODING_FLOAT16,
+    ENCODING_FLOAT32,
+    ENCODING_SNORM16,
+    ENCODING_UNORM16,
+    ENCODING_UNORM8,
+    FILTER_BYTE_SHUFFLE,
+    FILTER_NONE,
+    FORMAT_VERSION,
+    LEGACY_FORMAT_VERSION,
+    VERTEX_ORDER_BLENDER,
+    VERTEX_ORDER_SPLIT,
+    ChunkedValues,
+    ContentShare,
+    FormatSettings,
+    Writer,
+    encode_record,
+)
 
-FORMAT_VERSION = 2
+# AttributeExporterAttributeSelection.encoding -> record encoding
+ENCODINGS = {
+    "FLOAT32": ENCODING_FLOAT32,
+    "FLOAT16": ENCODING_FLOAT16,
+    "UNORM8": ENCODING_UNORM8,
+    "UNORM16": ENCODING_UNORM16,
+    "SNORM16": ENCODING_SNORM16,
+}
+
+# AttributeExporterPackage.vertex_order -> object vertex order
+VERTEX_ORDERS = {
+    "BLENDER": VERTEX_ORDER_BLENDER,
+    "UNITY": VERTEX_ORDER_SPLIT,
+}
 
 
 class Step:
     obj: bpy.types.Object
     source_uv: Tuple[int, int]
     vertex_storage: str
-    attributes: List[str]
+    attributes: Sequence[str]
+    encodings: Dict[str, int]
 
     def __init__(self, obj: bpy.types.Object, source_uv: Tuple[int, int], vertex_storage: str):
         self.obj = obj
         self.source_uv = source_uv
         self.vertex_storage = vertex_storage
         self.attributes = []
+        self.encodings = {}
 
 
 class Plan:
+    """
+    Collects steps while a package's entries are read. Once they all have
+    been, compile() turns it into a CompiledPlan.
+    """
+
     steps: Dict[bpy.types.Object, Step]
 
     def __init__(self) -> None:
@@ -35,80 +87,631 @@ class Plan:
         if obj not in self.steps:
             self.steps[obj] = Step(obj, source, vertex_storage)
 
-    def add(self, obj: bpy.types.Object, attribute: str) -> None:
+    def add(self, obj: bpy.types.Object, attribute: str, encoding: int = ENCODING_FLOAT32) -> None:
         self.steps[obj].attributes.append(attribute)
+        self.steps[obj].encodings[attribute] = encoding
+
+    def add_all(self, obj: bpy.types.Object, attributes: List[Tuple[str, int]]) -> None:
+        step = self.steps[obj]
+
+        for attribute, encoding in attributes:
+            step.attributes.append(attribute)
+            step.encodings[attribute] = encoding
+
+    def compile(self) -> "CompiledPlan":
+        for step in self.steps.values():
+            step.attributes = tuple(step.attributes)
+
+        ordered = tuple(sorted(self.steps.values(), key=lambda step: step.obj.name))
+
+        return CompiledPlan(MappingProxyType(dict(self.steps)), ordered)
+
+
+class CompiledPlan(NamedTuple):
+    """
+    A finished plan. Its steps are sorted by object name once, up front,
+    and can't be added to any more.
+    """
+
+    steps: Mapping[bpy.types.Object, Step]
+    ordered: Tuple[Step, ...]
+
+    def find_problems(self) -> List[str]:
+        problems = []
 
-    def validate(self) -> None:
         for obj, step in self.steps.items():
             seen = set()
 
             for attribute in step.attributes:
                 if attribute in seen:
-                    raise ValueError(
+                    problems.append(
                         f"Duplicate part: {obj.name} tries to export {attribute} more than once."
                     )
                 seen.add(attribute)
 
-    def get_steps(self) -> Iterator[Step]:
-        for step in sorted(self.steps.values(), key=lambda step: step.obj.name):
-            yield step
+        return problems
+
+    def get_steps(self) -> Tuple[Step, ...]:
+        return self.ordered
 
     def get_object_count(self) -> int:
-        return len(self.steps)
+        return len(self.ordered)
 
 
-def perform_export(
-    context: bpy.types.Context, package: props.AttributeExporterPackage
-) -> None:
-    plan = Plan()
+class Scratch:
+    """
+    A buffer that chunked exports read every attribute into, so that
+    memory use doesn't grow with the number of records. It only grows
+    when a bigger attribute comes along.
+    """
+
+    chunk_size: int
+    buffer: numpy.ndarray
+
+    def __init__(self, chunk_size: int):
+        self.chunk_size = chunk_size
+        self.buffer = numpy.empty(0, dtype=numpy.float32)
+
+    def get(self, size: int) -> numpy.ndarray:
+        if len(self.buffer) < size:
+            # let go of the old buffer before allocating the new one
+            self.buffer = None
+            self.buffer = numpy.empty(size, dtype=numpy.float32)
+
+        return self.buffer[:size]
+
+
+class InstanceGroup(NamedTuple):
+    """
+    Objects in a package that share their mesh. If they're identical (no
+    modifiers that could change their attributes), their records are
+    shared without evaluating them; otherwise, records are shared when
+    their contents turn out to be identical.
+    """
+
+    key: Hashable
+    identical: bool
+    members: Tuple[bpy.types.Object, ...]
+
+
+def get_instance_key(obj: bpy.types.Object, node_tree: Optional[bpy.types.NodeTree]) -> Tuple[Hashable, bool]:
+    """
+    Objects with the same key end up with the same attributes. Returns the
+    key, and whether that's guaranteed without evaluating them.
+    """
+    mesh = obj.data
+
+    if needs_evaluation(obj, node_tree):
+        return (mesh, "evaluated"), False
+
+    # which shape key is shown, and vertex group names, belong to the object
+    shape = (obj.active_shape_key_index, obj.show_only_shape_key) if mesh.shape_keys else None
+    groups = tuple(group.name for group in obj.vertex_groups)
+
+    return (mesh, shape, groups), True
+
+
+class PackageExport:
+    """
+    Everything we need to know about one package while exporting it
+    alongside others.
+    """
+
+    package: props.AttributeExporterPackage
+    plan: CompiledPlan
+    settings: FormatSettings
+    vertex_order: int
+    filepath: str
+    cache_path: str
+    cache: Optional[ExportCache]
+    writer: Optional[Writer]
+    digests: Dict[bpy.types.Object, bytes]
+    stale: Set[bpy.types.Object]
+    groups: Dict[bpy.types.Object, InstanceGroup]
+
+    def __init__(
+        self, package: props.AttributeExporterPackage, resolver: Optional[props.ObjectResolver] = None
+    ):
+        self.package = package
+
+        resolver = resolver or props.ObjectResolver()
+        source_uv = (int(package.source_uv), 0)
+        vertex_storage = package.default_vertex_storage
+        plan = Plan()
+
+        for entry in package.entries:
+            # read the entry's attributes once, rather than once per object
+            attributes = [(item.selection.attribute, ENCODINGS[item.encoding]) for item in entry.attributes]
+
+            for obj in entry.get_objects(resolver):
+                plan.register(obj, source_uv, vertex_storage)
+                plan.add_all(obj, attributes)
+
+        self.plan = plan.compile()
+
+        self.settings = get_format_settings(package)
+        self.vertex_order = VERTEX_ORDERS[package.vertex_order]
+
+        directory = bpy.path.abspath(package.path)
+        self.filepath = os.path.join(directory, package.label + ".attrdata")
+        self.cache_path = os.path.join(directory, package.label + ".attrcache")
+
+        self.cache = None
+        self.writer = None
+        self.digests = {}
+        self.stale = set(self.plan.steps)
+        self.groups = {}
+
+    def find_problems(self) -> List[str]:
+        problems = self.plan.find_problems()
+
+        if self.vertex_order != VERTEX_ORDER_BLENDER and self.settings.version < 7:
+            problems.append(
+                f"Unsupported settings: {self.package.label} can only be written in Unity's vertex order with the current format."
+            )
+
+        return problems
+
+    def find_instances(self, node_tree: Optional[bpy.types.NodeTree]) -> None:
+        """
+        Groups objects that share their mesh, so that their records can be
+        written once and shared. Only version 8 onwards can share records.
+        """
+        if self.settings.version < 8:
+            return
+
+        found = {}
+
+        for step in self.plan.get_steps():
+            key, identical = get_instance_key(step.obj, node_tree)
+            found.setdefault((key, identical), []).append(step.obj)
+
+        for (key, identical), members in found.items():
+            if len(members) < 2:
+                continue
+
+            group = InstanceGroup(key, identical, tuple(members))
+
+            for obj in members:
+                self.groups[obj] = group
+
+    def is_shared(self, obj: bpy.types.Object, attribute: str) -> bool:
+        """
+        Whether an identical object comes before this one and exports the
+        same attribute the same way, so that this object's record can just
+        refer to that one's without being evaluated.
+        """
+        group = self.groups.get(obj)
+
+        if group is None or not group.identical:
+            return False
+
+        encoding = self.plan.steps[obj].encodings[attribute]
 
-    for entry in package.entries:
-        for obj in entry.get_objects():
-            plan.register(obj, (int(package.source_uv), 0), package.default_vertex_storage)
-            for item in entry.attributes:
-                plan.add(obj, item.selection.attribute)
+        for member in group.members:
+            if member is obj:
+                return False
+            if self.plan.steps[member].encodings.get(attribute) == encoding:
+                return True
 
-    plan.validate()
+        return False
 
-    output = b""
+    def get_share_key(self, obj: bpy.types.Object, attribute: str) -> Optional[Hashable]:
+        """
+        What other objects can refer to this object's record by, if any.
+        Records are only ever shared within a group, since the cache only
+        keeps a group's members fresh together.
+        """
+        group = self.groups.get(obj)
 
-    output += struct.pack("<i", FORMAT_VERSION)
-    output += struct.pack("<i", plan.get_object_count())
+        if group is None:
+            return None
+        if not group.identical:
+            return ContentShare(group.key)
 
-    with EnsureGeonodes(context, [step.obj for step in plan.get_steps()]):
-        for step in plan.get_steps():
-            output += write_object(step)
-    
-    filepath = bpy.path.abspath(package.path)
-    filepath = os.path.join(filepath, package.label + ".attrdata")
+        return (group.key, attribute, self.plan.steps[obj].encodings[attribute])
 
-    with open(
-        filepath, "wb"
-    ) as file:
-        file.write(output)
+    def check_cache(self, node_tree: Optional[bpy.types.NodeTree], toggled: List[str], frame: int) -> bool:
+        """
+        Works out which objects have changed since the last export. Vertex
+        weights, the geometry node trees that get toggled on for the export
+        and the current frame are only looked at for objects whose
+        modifiers could use them.
 
-def write_object(step: Step):
-    output = b""
+        Returns False if nothing changed and the package doesn't need to
+        be written at all.
+        """
+        package_digest = hashlib.sha1()
+        digests = {}
 
+        for step in self.plan.get_steps():
+            evaluated = needs_evaluation(step.obj, node_tree)
+            digests[step.obj] = fingerprint(
+                step.obj,
+                self.settings,
+                step.source_uv,
+                step.vertex_storage,
+                sorted(step.encodings.items()),
+                self.vertex_order,
+                (toggled, frame) if evaluated else None,
+                weights=evaluated,
+                source_uv=step.source_uv[0],
+                vertex_tree=node_tree,
+            )
+
+        for step in self.plan.get_steps():
+            digest = digests[step.obj]
+            group = self.groups.get(step.obj)
+
+            # objects that share records refer to each other, so they're
+            # only fresh if all of them are
+            if group is not None:
+                combined = hashlib.sha1(digest)
+
+                for member in group.members:
+                    combined.update(member.name.encode("utf-8"))
+                    combined.update(digests[member])
+
+                digest = combined.digest()
+
+            self.digests[step.obj] = digest
+
+            if self.cache.is_fresh(step.obj.name, digest):
+                self.stale.discard(step.obj)
+
+            package_digest.update(step.obj.name.encode("utf-8"))
+            package_digest.update(digest)
+
+        # one of them might have been dropped from the cache on its own
+        for obj in list(self.stale):
+            group = self.groups.get(obj)
+
+            if group is None:
+                continue
+
+            for member in group.members:
+                if member not in self.stale:
+                    self.stale.add(member)
+                    self.cache.hits -= 1
+                    self.cache.misses += 1
+
+        self.cache.package_digest = package_digest.digest()
+
+        if self.stale or self.cache.package_digest != self.cache.previous_digest:
+            return True
+
+        return not os.path.exists(self.filepath)
+
+
+def raise_problems(problems: List[str]) -> None:
+    if len(problems) == 1:
+        raise ValueError(problems[0])
+    if problems:
+        raise ValueError(f"Found {len(problems)} problems:\n" + "\n".join(problems))
+
+
+def check_attributes(obj: bpy.types.Object, attributes: List[str], found: List[AttributeInfo]) -> List[str]:
+    """
+    Checks that every attribute an object is meant to export exists, and
+    is a per-vertex attribute of a type we can export.
+    """
+    problems = []
+    found = {info.name: info for info in found if not info.name.startswith(".")}
+
+    for attribute in attributes:
+        info = found.get(attribute)
+
+        if info is None:
+            problems.append(f"Missing attribute: {obj.name} does not have {attribute}")
+        elif info.data_type not in ATTRIBUTE_TYPES:
+            problems.append(
+                f"Unsupported attribute: {obj.name}'s {attribute} holds {info.data_type} values. "
+                f"Only {', '.join(ATTRIBUTE_TYPES)} attributes can be exported."
+            )
+        elif info.domain != "POINT":
+            problems.append(
+                f"Unsupported attribute: {obj.name}'s {attribute} is stored on the {info.domain} domain. "
+                f"Only POINT attributes can be exported."
+            )
+
+    return problems
+
+
+def check_vertex_storage(step: Step, node_tree: Optional[bpy.types.NodeTree]) -> List[str]:
+    """
+    Checks that the object's vertex IDs can be stored in its source UV map.
+    """
     obj = step.obj
+    mesh = obj.data
+    channel = step.source_uv[0]
+    problems = []
 
-    encoded_name = obj.name.encode("utf-8")
-    padding = (4 - len(encoded_name)) % 4
+    if len(mesh.uv_layers) <= channel and mesh.library is not None:
+        problems.append(
+            f"Missing UV map: {obj.name} needs a UV map in UV{channel} for its vertex IDs, "
+            f"but its mesh is linked from another file."
+        )
 
-    output += struct.pack("<i", len(encoded_name))
-    output += encoded_name
-    output += b"\x00" * padding
+    if step.vertex_storage == "BAKED" and mesh.library is not None:
+        problems.append(f"Can't bake vertex IDs: {obj.name}'s mesh is linked from another file.")
 
-    source_uv_layer = step.source_uv[0]
-    source_uv_dim = step.source_uv[1]
+    if step.vertex_storage == "MODIFIER" and node_tree is not None and obj.library is not None:
+        attached = any(
+            modifier.type == "NODES" and modifier.node_group == node_tree for modifier in obj.modifiers
+        )
+
+        if not attached:
+            problems.append(
+                f"Can't attach the vertex ID modifier: {obj.name} is linked from another file."
+            )
+
+    return problems
+
+
+def needs_evaluation(obj: bpy.types.Object, node_tree: Optional[bpy.types.NodeTree]) -> bool:
+    """
+    Whether an object's modifiers might add or change attributes, so that
+    only its evaluated mesh can tell us which ones it has. The vertex ID
+    modifier only ever writes UVs.
+    """
+    for modifier in obj.modifiers:
+        if modifier.type == "NODES" and node_tree is not None and modifier.node_group == node_tree:
+            continue
+        return True
+
+    return False
+
+
+def get_vertex_node_tree() -> Optional[bpy.types.NodeTree]:
+    if not library.library_exists():
+        return None
+
+    try:
+        return library.get_vertex_node_tree()
+    except KeyError:
+        return None
+
+
+def preflight(exports: List[PackageExport]) -> List[str]:
+    """
+    Checks everything that can be checked without evaluating anything.
+    Attributes are checked here for objects without modifiers; the rest
+    have to wait until they've been evaluated (see check_evaluated()).
+    """
+    problems = []
+
+    for export in exports:
+        problems += export.find_problems()
+
+    node_tree = get_vertex_node_tree()
+    uses_modifier = any(
+        step.vertex_storage == "MODIFIER" for export in exports for step in export.plan.steps.values()
+    )
+
+    if uses_modifier and not library.library_exists():
+        problems.append(
+            "Missing library: press Link Library in the Attribute Exporter panel before exporting with modifier vertex storage."
+        )
+    elif uses_modifier and node_tree is None:
+        problems.append("Missing node group: the add-on's library doesn't contain the Store Vertex ID node group.")
+
+    for export in exports:
+        for step in export.plan.get_steps():
+            problems += check_vertex_storage(step, node_tree)
+
+            if not needs_evaluation(step.obj, node_tree):
+                problems += check_attributes(step.obj, step.attributes, describe_attributes(step.obj.data))
+
+    return problems
+
+
+def check_evaluated(
+    exports: List[PackageExport], objects: List[bpy.types.Object], depsgraph: bpy.types.Depsgraph
+) -> List[str]:
+    """
+    Checks the attributes of objects whose modifiers might change them,
+    from their evaluated meshes' metadata, before any of them get copied
+    or written.
+    """
+    problems = []
+    node_tree = get_vertex_node_tree()
+
+    for obj in objects:
+        if not needs_evaluation(obj, node_tree):
+            continue
+
+        found = discover_attributes([obj], depsgraph)[obj]
+
+        for export in exports:
+            if obj in export.stale:
+                problems += check_attributes(obj, export.plan.steps[obj].attributes, found)
+
+    return problems
+
+
+def get_format_settings(package: props.AttributeExporterPackage) -> FormatSettings:
+    if package.format_version == "LEGACY":
+        return FormatSettings(version=LEGACY_FORMAT_VERSION)
+
+    if package.compression == "ZLIB":
+        return FormatSettings(
+            version=FORMAT_VERSION,
+            compression=COMPRESSION_ZLIB,
+            level=package.compression_level,
+            filter=FILTER_BYTE_SHUFFLE if package.byte_shuffle else FILTER_NONE,
+        )
+
+    return FormatSettings(version=FORMAT_VERSION, compression=COMPRESSION_NONE)
 
-    output += struct.pack("<i", source_uv_layer)
-    output += struct.pack("<i", source_uv_dim)
-    output += struct.pack("<i", len(step.attributes))
+
+def perform_export(
+    context: bpy.types.Context,
+    package: props.AttributeExporterPackage,
+    profiler: Optional[Profiler] = None,
+) -> PackageExport:
+    return perform_exports(context, [package], profiler)[0]
+
+
+def perform_exports(
+    context: bpy.types.Context,
+    packages: List[props.AttributeExporterPackage],
+    profiler: Optional[Profiler] = None,
+) -> List[PackageExport]:
+    """
+    Exports several packages in one pass: geometry nodes are toggled once,
+    and each object is evaluated once no matter how many packages use it.
+    Every problem is reported at once, before anything in the scene is
+    changed.
+
+    If a profiler is given, every phase of the export is timed with it.
+    """
+    profiler = profiler or Profiler(enabled=False)
+
+    with profiler.span("Build plans"):
+        resolver = props.ObjectResolver()
+        exports = [PackageExport(package, resolver) for package in packages]
+
+    with profiler.span("Preflight"):
+        problems = preflight(exports)
+
+    with profiler.span("Find instances"):
+        node_tree = get_vertex_node_tree()
+
+        for export in exports:
+            export.find_instances(node_tree)
+
+    toggled = sorted(item.tree.name for item in context.scene.toggled_geonode_trees if item.tree)
+    frame = context.scene.frame_current
+
+    with ExitStack() as stack:
+        writing = []
+
+        for export in exports:
+            label = export.package.label
+
+            if export.package.use_cache:
+                export.cache = stack.enter_context(
+                    profiler.timed(ExportCache(export.cache_path), "Load cache", "Save cache", package=label)
+                )
+
+                with profiler.span("Check cache", package=label):
+                    changed = export.check_cache(node_tree, toggled, frame)
+
+                if not changed:
+                    print("Nothing changed in " + label)
+                    continue
+
+            writing.append(export)
+
+        objects = set()
+
+        for export in writing:
+            objects.update(export.plan.steps)
+
+        objects = sorted(objects, key=lambda obj: obj.name)
+        stale = [obj for obj in objects if any(obj in export.stale for export in writing)]
+
+        if context.scene.attribute_exporter_scoped_evaluation:
+            view_layer = stack.enter_context(
+                profiler.timed(
+                    ScopedEvaluation(context, stale), "Set up evaluation scene", "Remove evaluation scene"
+                )
+            )
+        else:
+            view_layer = context.view_layer
+
+        geonodes = EnsureGeonodes(context, stale, view_layer)
+
+        with profiler.timed(geonodes, "Enable geometry nodes", "Restore geometry nodes"):
+            if context.scene.attribute_exporter_scoped_evaluation:
+                # the temporary scene hasn't been evaluated yet, unless
+                # toggling geometry nodes already did that
+                if not geonodes.changed:
+                    with profiler.span("Update view layer"):
+                        view_layer.update()
+
+                depsgraph = view_layer.depsgraph
+            else:
+                depsgraph = context.evaluated_depsgraph_get()
+
+            with profiler.span("Check evaluated attributes"):
+                problems += check_evaluated(writing, stale, depsgraph)
+
+            # objects shared between packages would otherwise report
+            # everything twice
+            raise_problems(list(dict.fromkeys(problems)))
+
+            # nothing in the scene is changed until everything has been
+            # checked. Vertex IDs only need baking again for objects that
+            # get evaluated
+            baking = set(stale)
+            prepared = False
+
+            for export in exports:
+                for step in export.plan.get_steps():
+                    if prepare_object(step, profiler, step.obj in baking):
+                        prepared = True
+                    baking.discard(step.obj)
+
+            if prepared:
+                with profiler.span("Update prepared objects"):
+                    depsgraph.update()
+
+            # nothing gets written until everything has been checked
+            for export in writing:
+                label = export.package.label
+
+                export.writer = stack.enter_context(
+                    profiler.timed(
+                        Writer(export.filepath, export.settings), "Open file", "Finish file", package=label
+                    )
+                )
+
+                with profiler.span("Write header", package=label) as span:
+                    export.writer.write_header(
+                        [(step.obj.name, sorted(step.attributes)) for step in export.plan.get_steps()]
+                    )
+                    span.args["bytes"] = export.writer.position
+
+            threads = context.scene.attribute_exporter_threads
+            chunk_size = context.scene.attribute_exporter_chunk_size
+            scratch = None
+
+            if chunk_size > 0:
+                # every record is written before the scratch buffer is reused
+                scratch = Scratch(chunk_size)
+                threads = 0
+
+            with profiler.timed(Pipeline(threads), "Start pipeline", "Wait for pipeline") as pipeline:
+                for obj in objects:
+                    write_object(
+                        obj,
+                        [export for export in writing if obj in export.plan.steps],
+                        depsgraph,
+                        pipeline,
+                        profiler,
+                        scratch,
+                    )
+
+    return exports
+
+def prepare_object(step: Step, profiler: Profiler, bake: bool = True) -> bool:
+    """
+    Makes sure the object can hold its vertex IDs. Baked vertex IDs are
+    only written again if bake is set.
+
+    Returns whether anything changed, and the object has to be evaluated
+    again.
+    """
+    obj = step.obj
+    changed = False
+
+    source_uv_layer = step.source_uv[0]
 
     while len(obj.data.uv_layers) <= source_uv_layer:
         print("Adding a UV map to " + obj.name)
         obj.data.uv_layers.new()
+        changed = True
 
     if step.vertex_storage == 'MODIFIER':
         node_tree = library.get_vertex_node_tree()
@@ -123,73 +726,356 @@ def write_object(step: Step):
             print("Attaching a modifier to " + obj.name)
             modifier = obj.modifiers.new("Vertex IDs", 'NODES')
             modifier.node_group = library.get_vertex_node_tree()
+            changed = True
+
+        source_layer = obj.data.uv_layers[source_uv_layer]
+
+        if source_layer.name != "Vertex ID":
+            for layer in obj.data.uv_layers:
+                if layer.name == "Vertex ID":
+                    layer.name = "UV Map"
+                    print("Renamed an old UV layer!")
 
-        for layer in obj.data.uv_layers:
-            if layer.name == "Vertex ID":
-                layer.name = "UV Map"
-                print("Renamed an old UV layer!")
+            source_layer.name = "Vertex ID"
+            changed = True
 
-        obj.data.uv_layers[source_uv_layer].name = "Vertex ID"
+    if step.vertex_storage == 'BAKED' and bake:
+        with profiler.span("Bake vertex IDs", object=obj.name):
+            if bake_vertex_ids(obj, source_uv_layer):
+                changed = True
+
+    return changed
+
+def write_object(
+    obj: bpy.types.Object,
+    exports: List[PackageExport],
+    depsgraph: bpy.types.Depsgraph,
+    pipeline: Pipeline,
+    profiler: Profiler,
+    scratch: Optional[Scratch] = None,
+) -> None:
+    """
+    Writes an object to every package that exports it. With a scratch
+    buffer, records are encoded and written a chunk at a time.
+    """
+    stale = []
+    stores = []
 
+    for export in exports:
+        step = export.plan.steps[obj]
 
-    for attribute in sorted(step.attributes):
-        output += write_attribute(obj, attribute)
+        if obj not in export.stale:
+            copy = profiler.wrap(
+                partial(copy_object, export.cache, obj.name, export.writer),
+                "Copy from cache",
+                result="bytes",
+                package=export.package.label,
+                object=obj.name,
+            )
+            pipeline.submit(None, copy)
+            continue
 
-    if step.vertex_storage == 'BAKED':
+        if export.cache:
+            store = export.cache.store(obj.name, export.digests[obj], export.writer)
+            pipeline.submit(None, store.begin)
+            stores.append(store)
 
-        for idx, loop in enumerate(obj.data.loops):
-            obj.data.uv_layers[source_uv_layer].data[idx].uv = Vector((loop.vertex_index, 0))
+        pipeline.submit(
+            None,
+            partial(
+                export.writer.write_object,
+                obj.name,
+                step.source_uv,
+                len(step.attributes),
+                export.vertex_order,
+            ),
+        )
+        stale.append(export)
 
-    return output
+    attributes = set()
+    evaluate = False
 
-def write_attribute(obj: bpy.types.Object, attribute: str) -> None:
-    output = b""
+    for export in stale:
+        for attribute in export.plan.steps[obj].attributes:
+            attributes.add(attribute)
+            evaluate = evaluate or not export.is_shared(obj, attribute)
 
-    depsgraph = bpy.context.evaluated_depsgraph_get()
-    bm = bmesh.new()
+    with ExitStack() as stack:
+        if evaluate:
+            evaluated = EvaluatedMesh(obj, depsgraph)
+            mesh = stack.enter_context(profiler.timed(evaluated, "Evaluate mesh", "Free mesh", object=obj.name))
+            vertex_maps = {VERTEX_ORDER_BLENDER: None}
 
-    bm.from_object(obj, depsgraph)
+            if any(export.vertex_order == VERTEX_ORDER_SPLIT for export in stale):
+                with profiler.span("Split vertices", object=obj.name):
+                    vertex_maps[VERTEX_ORDER_SPLIT] = split_vertices(mesh)
 
-    bm.verts.ensure_lookup_table()
+            if scratch is not None:
+                # grow the buffer once for the widest attribute, instead of
+                # while the previous attribute's values are still in use
+                scratch.get(len(mesh.vertices) * get_widest_attribute(mesh, attributes))
 
-    print("Attribute: " + attribute)
+        for attribute in sorted(attributes):
+            # packages with the same settings can share the encoded record,
+            # and instances can refer to a record written for an earlier one
+            writers = {}
+            shared = []
 
-    if attribute in bm.verts.layers.float_color:
-        layer = bm.verts.layers.float_color[attribute]
-        dimensions = 4
-    elif attribute in bm.verts.layers.float_vector:
-        layer = bm.verts.layers.float_vector[attribute]
-        dimensions = 3
-    elif attribute in bm.verts.layers.float:
-        layer = bm.verts.layers.float[attribute]
-        dimensions = 1
+            for export in stale:
+                step = export.plan.steps[obj]
+
+                if attribute not in step.attributes:
+                    continue
+
+                if export.is_shared(obj, attribute):
+                    shared.append(export)
+                else:
+                    key = (export.settings, step.encodings[attribute], export.vertex_order)
+                    writers.setdefault(key, []).append(export)
+
+            if shared:
+                write = profiler.wrap(
+                    partial(
+                        write_shared_record,
+                        [export.writer for export in shared],
+                        attribute,
+                        [export.get_share_key(obj, attribute) for export in shared],
+                    ),
+                    "Write shared",
+                    result="bytes",
+                    package=[export.package.label for export in shared],
+                    object=obj.name,
+                    attribute=attribute,
+                )
+                pipeline.submit(None, write)
+
+            if not writers:
+                continue
+
+            print("Attribute: " + attribute)
+
+            with profiler.span("Extract", object=obj.name, attribute=attribute):
+                dimensions, data = read_attribute(obj, mesh, attribute, scratch)
+
+            for (settings, encoding, vertex_order), group in writers.items():
+                labels = [export.package.label for export in group]
+                vertex_map = vertex_maps[vertex_order]
+
+                if scratch is not None:
+                    write = profiler.wrap(
+                        partial(
+                            write_chunked_record,
+                            [export.writer for export in group],
+                            attribute,
+                            ChunkedValues(data, dimensions, scratch.chunk_size, vertex_map),
+                            encoding,
+                            [export.get_share_key(obj, attribute) for export in group],
+                        ),
+                        "Write chunked",
+                        result="bytes",
+                        package=labels,
+                        object=obj.name,
+                        attribute=attribute,
+                    )
+                    pipeline.submit(None, write)
+                    continue
+
+                if vertex_map is None:
+                    values = data
+                else:
+                    values = data.reshape(-1, dimensions)[vertex_map].ravel()
+
+                encode = profiler.wrap(
+                    partial(encode_record, attribute, dimensions, values, settings, encoding),
+                    "Encode",
+                    package=labels,
+                    object=obj.name,
+                    attribute=attribute,
+                )
+                write = profiler.wrap(
+                    partial(
+                        write_record,
+                        [export.writer for export in group],
+                        attribute,
+                        shares=[export.get_share_key(obj, attribute) for export in group],
+                    ),
+                    "Write",
+                    result="bytes",
+                    package=labels,
+                    object=obj.name,
+                    attribute=attribute,
+                )
+                pipeline.submit(encode, write)
+
+    for store in stores:
+        pipeline.submit(None, store.end)
+
+def write_record(
+    writers: List[Writer], name: str, buffers: List, shares: Optional[List[Optional[Hashable]]] = None
+) -> int:
+    """
+    Writes an encoded record to every writer, shared under the matching
+    key from shares (if any). Returns how many bytes were written in total.
+    """
+    written = 0
+
+    for writer, share in zip(writers, shares or [None] * len(writers)):
+        start = writer.position
+        writer.write_encoded_record(name, buffers, share)
+        written += writer.position - start
+
+    return written
+
+def write_chunked_record(
+    writers: List[Writer],
+    name: str,
+    values: ChunkedValues,
+    encoding: int,
+    shares: List[Optional[Hashable]],
+) -> int:
+    """
+    Encodes and writes a record a chunk at a time to every writer. Each
+    writer encodes it again, rather than keeping the whole record around.
+    Returns how many bytes were written in total.
+    """
+    written = 0
+
+    for writer, share in zip(writers, shares):
+        start = writer.position
+        writer.write_chunked_record(name, values, encoding, share)
+        written += writer.position - start
+
+    return written
+
+def write_shared_record(writers: List[Writer], name: str, shares: List[Hashable]) -> int:
+    """
+    Writes a record to every writer that refers to the one shared under
+    the matching key. Returns how many bytes were written in total.
+    """
+    written = 0
+
+    for writer, share in zip(writers, shares):
+        start = writer.position
+        writer.write_shared_record(name, share)
+        written += writer.position - start
+
+    return written
+
+def copy_object(cache: ExportCache, name: str, writer: Writer) -> int:
+    start = writer.position
+    cache.copy(name, writer)
+    return writer.position - start
+
+def bake_vertex_ids(obj: bpy.types.Object, uv_layer: int) -> bool:
+    """
+    Writes each corner's vertex index into a UV map. Returns whether they
+    were different from what was already there.
+    """
+    loops = obj.data.loops
+    data = obj.data.uv_layers[uv_layer].data
+
+    vertex_indices = numpy.empty(len(loops), dtype=numpy.int32)
+    loops.foreach_get("vertex_index", vertex_indices)
+
+    uvs = numpy.empty((len(loops), 2), dtype=numpy.float32)
+    data.foreach_get("uv", uvs.ravel())
+
+    # compared as the float32 values they'd be baked as, so that NumPy
+    # doesn't make float64 copies of both
+    baked = vertex_indices.astype(numpy.float32)
+
+    if not uvs[:, 1].any() and numpy.array_equal(uvs[:, 0], baked):
+        return False
+
+    uvs[:, 0] = baked
+    uvs[:, 1] = 0
+
+    data.foreach_set("uv", uvs.ravel())
+    # foreach_set() doesn't tell the depsgraph that anything changed
+    obj.data.update_tag()
+    return True
+
+
+def split_vertices(mesh: bpy.types.Mesh) -> numpy.ndarray:
+    """
+    Works out which vertices Unity will end up with when it imports the
+    mesh. Unity gives every distinct combination of vertex, normal, UVs and
+    corner colors its own vertex, in the order those combinations first
+    show up in the mesh's corners.
+
+    Returns the Blender vertex that each of Unity's vertices came from.
+    """
+    loop_count = len(mesh.loops)
+
+    vertex_indices = numpy.empty(loop_count, dtype=numpy.int32)
+    mesh.loops.foreach_get("vertex_index", vertex_indices)
+
+    normals = numpy.empty(loop_count * 3, dtype=numpy.float32)
+
+    if hasattr(mesh, "corner_normals"):
+        mesh.corner_normals.foreach_get("vector", normals)
     else:
-        raise ValueError(f"Missing attribute: {obj.name} does not have {attribute}")
+        mesh.calc_normals_split()
+        mesh.loops.foreach_get("normal", normals)
 
-    vertex_count = len(bm.verts)
-    encoded_name = attribute.encode("utf-8")
-    padding = (4 - len(encoded_name)) % 4
+    columns = [vertex_indices.view(numpy.uint32)[:, None], normals.reshape(-1, 3)]
 
-    output += struct.pack("<i", len(encoded_name))
-    output += encoded_name
-    output += b"\x00" * padding
+    for layer in mesh.uv_layers:
+        uvs = numpy.empty(loop_count * 2, dtype=numpy.float32)
+        layer.data.foreach_get("uv", uvs)
+        columns.append(uvs.reshape(-1, 2))
 
-    output += struct.pack("<i", vertex_count)
-    output += struct.pack("<i", dimensions)
+    for layer in mesh.color_attributes:
+        if layer.domain == "CORNER":
+            colors = numpy.empty(loop_count * 4, dtype=numpy.float32)
+            layer.data.foreach_get("color", colors)
+            columns.append(colors.reshape(-1, 4))
 
-    colors = [0] * dimensions * vertex_count
+    # compare the floats' bits, with -0.0 turned into 0.0 so that it
+    # matches like it would in a float comparison
+    keys = numpy.hstack(
+        [columns[0]] + [(column + numpy.float32(0)).view(numpy.uint32) for column in columns[1:]]
+    )
 
-    for item_index, item in enumerate(bm.verts):
-        if dimensions == 1:
-            colors[item_index] = item[layer]
-        else:
-            for dim, color in enumerate(item[layer]):
-                index = item_index * dimensions + dim
-                colors[index] = color
+    _, first_loops = numpy.unique(keys, axis=0, return_index=True)
+
+    return vertex_indices[numpy.sort(first_loops)]
+
+
+def get_widest_attribute(mesh: bpy.types.Mesh, attributes: Sequence[str]) -> int:
+    """
+    How many dimensions the widest of these attributes has.
+    """
+    widest = 0
+
+    for attribute in attributes:
+        layer = mesh.attributes.get(attribute)
+
+        if layer is not None and layer.data_type in ATTRIBUTE_TYPES:
+            widest = max(widest, ATTRIBUTE_TYPES[layer.data_type][1])
+
+    return widest
+
+
+def read_attribute(
+    obj: bpy.types.Object, mesh: bpy.types.Mesh, attribute: str, scratch: Optional[Scratch] = None
+) -> Tuple[int, numpy.ndarray]:
+    """
+    Reads a per-vertex attribute from an evaluated mesh in one go.
+
+    Returns the number of dimensions and a flat float32 array holding
+    every vertex's components back to back. With a scratch buffer, the
+    array is part of it, and only valid until the next attribute is read.
+    """
+    layer = mesh.attributes.get(attribute)
+
+    if layer is None or not describe_attribute(layer).exportable:
+        raise ValueError(f"Missing attribute: {obj.name} does not have {attribute}")
 
-    bm.free()
+    key, dimensions = ATTRIBUTE_TYPES[layer.data_type]
 
-    for item in colors:
-        output += struct.pack("<f", item)
+    size = len(mesh.vertices) * dimensions
+    data = scratch.get(size) if scratch else numpy.empty(size, dtype=numpy.float32)
+    layer.data.foreach_get(key, data)
 
-    return output
+    return dimensions, data
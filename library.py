@@ -10,6 +10,10 @@ def get_library():
 def library_exists():
     return LIBRARY_NAME in bpy.data.libraries
 
+def link_library():
+    with bpy.data.libraries.load(BLEND_PATH, link=True) as (data_from, data_to):
+        data_to.node_groups = data_from.node_groups
+
 def get_vertex_node_tree():
     library = get_library()
     return bpy.data.node_groups["Store Vertex ID", get_library().filepath]
\ No newline at end of file
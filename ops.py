@@ -7,8 +7,26 @@ from mathutils import Vector
 
 from .context_managers import EnsureGeonodes
 
-from . import props, ui, library
-from .export import perform_export
+from . import choices, props, ui, library
+from .export import perform_export, perform_exports
+from .profiler import Profiler
+
+
+def report_profile(operator: bpy.types.Operator, context: bpy.types.Context, profiler: Profiler) -> None:
+    if not profiler.enabled:
+        return
+
+    profiler.print_report()
+
+    for line in profiler.summary():
+        operator.report({"INFO"}, line)
+
+    path = context.scene.attribute_exporter_trace_path
+
+    if path:
+        path = bpy.path.abspath(path)
+        profiler.save_trace(path)
+        operator.report({"INFO"}, f"Saved a trace to {path}")
 
 
 class UV_Link_Libraries(bpy.types.Operator):
@@ -17,8 +35,7 @@ class UV_Link_Libraries(bpy.types.Operator):
     bl_description = "Link data that the add-on depends on."
 
     def execute(self, context: bpy.types.Context):
-        with bpy.data.libraries.load(library.BLEND_PATH, link=True) as (data_from, data_to):
-            data_to.node_groups = data_from.node_groups
+        library.link_library()
 
         print(library.get_vertex_node_tree())
         return {"FINISHED"}
@@ -31,11 +48,18 @@ class UV_Export(bpy.types.Operator):
 
     def execute(self, context: bpy.types.Context):
         package = ui.get_current_package(context)
+        profiler = Profiler(enabled=context.scene.attribute_exporter_profile)
 
         try:
-            perform_export(context, package)
+            with profiler:
+                export = perform_export(context, package, profiler)
         except ValueError as e:
             self.report({"ERROR"}, str(e))
+        else:
+            if export.cache:
+                self.report({"INFO"}, f"{package.label}: {export.cache.describe()}")
+
+        report_profile(self, context, profiler)
 
         return {"FINISHED"}
 
@@ -46,8 +70,20 @@ class UV_Export_All(bpy.types.Operator):
     bl_description = "Export every package."
 
     def execute(self, context: bpy.types.Context):
-        for package in context.scene.attribute_exporter_packages:
-            perform_export(context, package)
+        profiler = Profiler(enabled=context.scene.attribute_exporter_profile)
+
+        try:
+            with profiler:
+                exports = perform_exports(context, list(context.scene.attribute_exporter_packages), profiler)
+        except ValueError as e:
+            self.report({"ERROR"}, str(e))
+        else:
+            hits = sum(export.cache.hits for export in exports if export.cache)
+            misses = sum(export.cache.misses for export in exports if export.cache)
+
+            self.report({"INFO"}, f"{hits} cached, {misses} exported")
+
+        report_profile(self, context, profiler)
 
         return {"FINISHED"}
 
@@ -58,5 +94,6 @@ class UV_Refresh(bpy.types.Operator):
     bl_description = "Re-calculate the list of attributes you can pick from."
 
     def execute(self, context: bpy.types.Context):
+        choices.cache.clear()
         props.refresh_attribute_choices(self, context)
         return {"FINISHED"}
@@ -0,0 +1,106 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+DEFAULT_MAX_PENDING = 16
+
+
+class Pipeline:
+    """
+    Overlaps extraction with everything that comes after it.
+
+    Blender data can only be touched from the main thread, so that's where
+    jobs get submitted from. Each job's encode step then runs on a thread
+    pool, and its deliver step (usually writing to a file) runs on a single
+    writer thread, strictly in the order the jobs were submitted. The
+    output is therefore byte-for-byte what running every job in turn would
+    have produced.
+
+    At most max_pending jobs are in flight at once; submitting more blocks
+    until the writer catches up, which keeps memory use bounded.
+
+    With no workers, jobs are simply run in turn as they are submitted.
+    """
+
+    workers: int
+    executor: Optional[ThreadPoolExecutor]
+    pending: "queue.Queue"
+    thread: Optional[threading.Thread]
+    error: Optional[BaseException]
+    aborted: bool
+
+    def __init__(self, workers: int, max_pending: int = DEFAULT_MAX_PENDING):
+        self.workers = workers
+        self.executor = None
+        self.pending = queue.Queue(maxsize=max(1, max_pending))
+        self.thread = None
+        self.error = None
+        self.aborted = False
+
+    def __enter__(self) -> "Pipeline":
+        if self.workers > 0:
+            self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="attribute-exporter")
+            self.thread = threading.Thread(target=self.drain, name="attribute-exporter-writer")
+            self.thread.start()
+
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if self.executor is None:
+            return
+
+        if exc_type is not None:
+            self.aborted = True
+
+        self.pending.put(None)
+        self.thread.join()
+        self.executor.shutdown()
+
+        if exc_type is None and self.error is not None:
+            raise self.error
+
+    def submit(self, encode: Optional[Callable], deliver: Callable) -> None:
+        """
+        Queues up a job. encode takes no arguments and its result is passed
+        to deliver; if there's nothing to encode, deliver is called with no
+        arguments instead.
+        """
+        if self.executor is None:
+            if encode is None:
+                deliver()
+            else:
+                deliver(encode())
+            return
+
+        if self.error is not None:
+            raise self.error
+
+        if encode is None:
+            future = None
+        else:
+            future = self.executor.submit(encode)
+
+        self.pending.put((future, deliver))
+
+    def drain(self) -> None:
+        while True:
+            item = self.pending.get()
+
+            if item is None:
+                return
+
+            future, deliver = item
+
+            if self.aborted or self.error is not None:
+                if future is not None:
+                    future.cancel()
+                continue
+
+            try:
+                if future is None:
+                    deliver()
+                else:
+                    deliver(future.result())
+            except BaseException as e:
+                self.error = e
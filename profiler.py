@@ -0,0 +1,355 @@
+import json
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class Span:
+    """
+    Times one phase of an export. Extra details (like how many bytes a
+    write produced) can be added to args before the span ends.
+    """
+
+    profiler: "Profiler"
+    name: str
+    category: str
+    args: Dict
+    start: float
+
+    def __init__(self, profiler: "Profiler", name: str, category: str, args: Dict):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        self.profiler.begin_memory()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        end = time.perf_counter()
+        peak = self.profiler.end_memory()
+        self.profiler.record(self, end, peak)
+
+
+class NullSpan:
+    """
+    Stands in for a Span when profiling is turned off.
+    """
+
+    args: Dict
+
+    def __init__(self):
+        self.args = {}
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class TimedContext:
+    """
+    Wraps a context manager so that entering and leaving it are timed as
+    two separate spans, and returns whatever it returned.
+    """
+
+    profiler: "Profiler"
+    manager: object
+    enter_name: str
+    exit_name: str
+    args: Dict
+
+    def __init__(self, profiler: "Profiler", manager, enter_name: str, exit_name: str, args: Dict):
+        self.profiler = profiler
+        self.manager = manager
+        self.enter_name = enter_name
+        self.exit_name = exit_name
+        self.args = args
+
+    def __enter__(self):
+        with self.profiler.span(self.enter_name, **self.args):
+            return self.manager.__enter__()
+
+    def __exit__(self, *args):
+        with self.profiler.span(self.exit_name, **self.args):
+            return self.manager.__exit__(*args)
+
+
+class Event:
+    name: str
+    category: str
+    thread: int
+    start: float
+    duration: float
+    peak: Optional[int]
+    args: Dict
+
+    def __init__(
+        self, name: str, category: str, thread: int, start: float, duration: float, peak: Optional[int], args: Dict
+    ):
+        self.name = name
+        self.category = category
+        self.thread = thread
+        self.start = start
+        self.duration = duration
+        self.peak = peak
+        self.args = args
+
+
+class Profiler:
+    """
+    Records how long each phase of an export takes, how much it writes and
+    (on the main thread) how much memory it allocates at its peak.
+
+    When disabled, spans cost next to nothing, so exports can always be
+    instrumented. Memory is tracked with tracemalloc, which only sees
+    allocations made through Python (NumPy arrays included, but not
+    Blender's own mesh data), and slows things down noticeably, so it is
+    only switched on while profiling.
+
+    Spans can be opened from any thread. Worker threads run at the same
+    time as the main thread, so adding up every span's duration counts
+    some wall time more than once; the trace shows what actually overlapped.
+    """
+
+    enabled: bool
+    events: List[Event]
+    lock: threading.Lock
+    thread_names: Dict[int, str]
+    main_thread: int
+    started: float
+    finished: float
+    peaks: List[int]
+    traced: bool
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.events = []
+        self.lock = threading.Lock()
+        self.thread_names = {}
+        self.main_thread = threading.get_ident()
+        self.started = 0.0
+        self.finished = 0.0
+        self.peaks = []
+        self.traced = False
+
+    def __enter__(self) -> "Profiler":
+        if self.enabled:
+            self.main_thread = threading.get_ident()
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.traced = True
+
+            self.started = time.perf_counter()
+
+        return self
+
+    def __exit__(self, *args):
+        if self.enabled:
+            self.finished = time.perf_counter()
+
+            if self.traced:
+                tracemalloc.stop()
+                self.traced = False
+
+    def span(self, name: str, category: str = "export", **args):
+        if not self.enabled:
+            return NullSpan()
+        return Span(self, name, category, args)
+
+    def timed(self, manager, enter_name: str, exit_name: str, **args):
+        """
+        Times entering and leaving a context manager.
+        """
+        if not self.enabled:
+            return manager
+        return TimedContext(self, manager, enter_name, exit_name, args)
+
+    def wrap(self, function: Callable, name: str, result: Optional[str] = None, **args) -> Callable:
+        """
+        Wraps a function (usually one that's about to be handed to another
+        thread) so that every call to it is timed. If result is given, the
+        function's return value is recorded under that name.
+        """
+        if not self.enabled:
+            return function
+
+        def timed(*call_args):
+            with self.span(name, **args) as span:
+                value = function(*call_args)
+
+                if result is not None:
+                    span.args[result] = value
+
+                return value
+
+        return timed
+
+    def begin_memory(self) -> None:
+        if not self.tracking_memory():
+            return
+
+        # spans nest on the main thread; a parent's peak has to include the
+        # peaks of all of its children, which get reset as they start
+        if self.peaks:
+            self.peaks[-1] = max(self.peaks[-1], tracemalloc.get_traced_memory()[1])
+
+        tracemalloc.reset_peak()
+        self.peaks.append(0)
+
+    def end_memory(self) -> Optional[int]:
+        if not self.tracking_memory():
+            return None
+
+        peak = max(self.peaks.pop(), tracemalloc.get_traced_memory()[1])
+
+        if self.peaks:
+            self.peaks[-1] = max(self.peaks[-1], peak)
+
+        tracemalloc.reset_peak()
+        return peak
+
+    def tracking_memory(self) -> bool:
+        return tracemalloc.is_tracing() and threading.get_ident() == self.main_thread
+
+    def record(self, span: Span, end: float, peak: Optional[int]) -> None:
+        thread = threading.current_thread()
+        event = Event(span.name, span.category, thread.ident, span.start, end - span.start, peak, span.args)
+
+        with self.lock:
+            self.events.append(event)
+            self.thread_names.setdefault(thread.ident, thread.name)
+
+    @property
+    def total_time(self) -> float:
+        return self.finished - self.started
+
+    @property
+    def peak_memory(self) -> int:
+        return max((event.peak or 0 for event in self.events), default=0)
+
+    @property
+    def bytes_written(self) -> int:
+        return sum(event.args.get("bytes", 0) for event in self.events)
+
+    def totals(self, key: str = None) -> List[Tuple[str, float]]:
+        """
+        Adds up the time spent in each kind of span, or (if key is given)
+        for each value of that argument, such as "object" or "package".
+        Spans shared by several packages are split evenly between them.
+        Sorted from slowest to fastest.
+        """
+        totals = {}
+
+        for event in self.events:
+            labels = [event.name] if key is None else get_labels(event, key)
+
+            for label in labels:
+                totals[label] = totals.get(label, 0.0) + event.duration / len(labels)
+
+        return sorted(totals.items(), key=lambda item: -item[1])
+
+    def bytes_by(self, key: str) -> Dict[str, int]:
+        result = {}
+
+        for event in self.events:
+            labels = get_labels(event, key)
+
+            for label in labels:
+                result[label] = result.get(label, 0) + event.args.get("bytes", 0) // len(labels)
+
+        return result
+
+    def summary(self, limit: int = 3) -> List[str]:
+        """
+        A few short lines describing where the time and memory went.
+        """
+        lines = [
+            f"Took {self.total_time:.2f}s, wrote {format_bytes(self.bytes_written)}, "
+            f"peak memory {format_bytes(self.peak_memory)}"
+        ]
+
+        phases = self.totals()[:limit]
+        if phases:
+            lines.append("Slowest phases: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in phases))
+
+        objects = self.totals("object")[:limit]
+        if objects:
+            lines.append("Slowest objects: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in objects))
+
+        return lines
+
+    def print_report(self) -> None:
+        """
+        Prints everything that was measured, broken down by package, object
+        and attribute.
+        """
+        for line in self.summary():
+            print(line)
+
+        package_bytes = self.bytes_by("package")
+
+        for key in (None, "package", "object", "attribute"):
+            print(f"Time by {key or 'phase'}:")
+
+            for label, seconds in self.totals(key):
+                line = f"  {label}: {seconds:.4f}s"
+
+                if key == "package" and label in package_bytes:
+                    line += f", {format_bytes(package_bytes[label])}"
+
+                print(line)
+
+    def save_trace(self, path: str) -> None:
+        """
+        Saves every span in Chrome's trace event format, which can be opened
+        with chrome://tracing or Perfetto.
+        """
+        trace = []
+
+        for thread, name in self.thread_names.items():
+            trace.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": thread, "args": {"name": name}})
+
+        for event in self.events:
+            args = dict(event.args)
+
+            if event.peak is not None:
+                args["peak_memory"] = event.peak
+
+            trace.append(
+                {
+                    "name": event.name,
+                    "cat": event.category,
+                    "ph": "X",
+                    "ts": (event.start - self.started) * 1e6,
+                    "dur": event.duration * 1e6,
+                    "pid": 1,
+                    "tid": event.thread,
+                    "args": args,
+                }
+            )
+
+        with open(path, "w") as file:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, file)
+
+
+def get_labels(event: Event, key: str) -> List[str]:
+    labels = event.args.get(key)
+
+    if labels is None:
+        return []
+    if isinstance(labels, list):
+        return labels
+    return [labels]
+
+
+def format_bytes(count: int) -> str:
+    if count < 1024 * 1024:
+        return f"{count / 1024:.1f} KB"
+    return f"{count / (1024 * 1024):.1f} MB"
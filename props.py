@@ -1,46 +1,86 @@
-from typing import Iterator, List
-import bmesh
+from typing import Dict, Iterator, List, Optional
 import bpy
 
-from .context_managers import EnsureGeonodes
-
-from . import ui
+from . import choices, discovery, ui
 
 
 def refresh_attribute_choices(self, context) -> None:
+    # the choices are only there for the UI, so background exports
+    # shouldn't pay for evaluating anything to fill them in
+    if bpy.app.background:
+        return
+
     entry = ui.get_current_entry(context)
 
     if entry:
         context.scene.attribute_choices.clear()
 
-        objects = entry.get_objects()
+        objects = sorted(entry.get_objects(), key=lambda obj: obj.name)
+
+        # evaluating objects is slow, so only look at the ones that
+        # changed since we last looked
+        missing = [obj for obj in objects if choices.cache.get(obj) is None]
+
+        if missing:
+            for obj, attributes in discovery.discover_in_scene(context, missing).items():
+                choices.cache.store(obj, attributes)
+
+        names = discovery.exportable_names(choices.cache.get(obj) for obj in objects)
+
+        for name in names:
+            choice = context.scene.attribute_choices.add()
+            choice.attribute = name
+            choice.name = name
+
+
+class ObjectResolver:
+    """
+    Works out which objects entries refer to: every visible mesh that's
+    listed directly, or anywhere inside one of their collections.
+
+    Collections and visibility are only looked at once, however many
+    entries share them, so one resolver should be used for everything
+    exported together.
+    """
+
+    exported: Dict[bpy.types.Object, bool]
+    collections: Dict[bpy.types.Collection, List[bpy.types.Object]]
+
+    def __init__(self):
+        self.exported = {}
+        self.collections = {}
 
-        if len(objects) > 0:
-            obj = objects[0]
-            print(obj)
+    def is_exported(self, obj: bpy.types.Object) -> bool:
+        exported = self.exported.get(obj)
 
-            with EnsureGeonodes(context, [obj]):
-                depsgraph = bpy.context.evaluated_depsgraph_get()
-                bm = bmesh.new()
-                bm.from_object(obj, depsgraph)
-                bm.verts.ensure_lookup_table()
+        if exported is None:
+            exported = obj.type == "MESH" and obj.visible_get()
+            self.exported[obj] = exported
 
-                options = [
-                    bm.verts.layers.float_color,
-                    bm.verts.layers.float_vector,
-                    bm.verts.layers.float,
-                ]
+        return exported
 
-                for option in options:
-                    for attribute in option:
-                        if attribute.name[0] == ".":
-                            continue
-                        choice = context.scene.attribute_choices.add()
-                        choice.attribute = attribute.name
-                        choice.name = attribute.name
-                        print(choice.attribute)
+    def resolve_collection(self, collection: bpy.types.Collection) -> List[bpy.types.Object]:
+        objects = self.collections.get(collection)
 
-                bm.free()
+        if objects is None:
+            objects = [obj for obj in collection.all_objects if self.is_exported(obj)]
+            self.collections[collection] = objects
+
+        return objects
+
+    def resolve(self, entry: "AttributeExporterEntry") -> List[bpy.types.Object]:
+        # a dict keeps the first time we saw each object, without duplicates
+        result = {}
+
+        for item in entry.objects:
+            if item.object is not None and self.is_exported(item.object):
+                result[item.object] = None
+
+        for collection in entry.collections:
+            if collection.pointer is not None:
+                result.update(dict.fromkeys(self.resolve_collection(collection.pointer)))
+
+        return list(result)
 
 
 class AttributeExporterCollection(bpy.types.PropertyGroup):
@@ -90,6 +130,18 @@ class AttributeExporterAttributeSelection(bpy.types.PropertyGroup):
     selection: bpy.props.PointerProperty(
         name="Attribute", type=AttributeExporterAttribute
     )  # type: ignore
+    encoding: bpy.props.EnumProperty(
+        name="Encoding",
+        description="How precisely the attribute's values are stored",
+        items=[
+            ("FLOAT32", "Float", "32-bit floats"),
+            ("FLOAT16", "Half", "16-bit floats"),
+            ("UNORM8", "8-bit Range", "8 bits per component, between the component's minimum and maximum"),
+            ("UNORM16", "16-bit Range", "16 bits per component, between the component's minimum and maximum"),
+            ("SNORM16", "16-bit Signed", "16 bits per component, scaled by the component's largest magnitude. Good for directions"),
+        ],
+        default="FLOAT32",
+    )  # type: ignore
 
 
 class AttributeExporterEntry(bpy.types.PropertyGroup):
@@ -107,19 +159,8 @@ class AttributeExporterEntry(bpy.types.PropertyGroup):
     )  # type: ignore
     attributes_index: bpy.props.IntProperty()  # type: ignore
 
-    def get_objects(self) -> List[bpy.types.Object]:
-        result = set()
-
-        for obj in self.objects:
-            if obj.object.visible_get():
-                result.add(obj.object)
-
-        for collection in self.collections:
-            for obj in collection.pointer.all_objects:
-                if obj.visible_get():
-                    result.add(obj)
-
-        return list(filter(lambda x: x.type == 'MESH', result))
+    def get_objects(self, resolver: Optional["ObjectResolver"] = None) -> List[bpy.types.Object]:
+        return (resolver or ObjectResolver()).resolve(self)
 
 class AttributeExporterPackage(bpy.types.PropertyGroup):
     label: bpy.props.StringProperty(name="Label")  # type: ignore
@@ -145,6 +186,50 @@ class AttributeExporterPackage(bpy.types.PropertyGroup):
             ("BAKED", "Baked", "Destructively set UVs. Necessary if shape keys need to be preserved.")
         ]
     ) # type: ignore
+    format_version: bpy.props.EnumProperty(
+        name="Format",
+        description="Which version of the file format to write",
+        items=[
+            ("CURRENT", "Current", "The latest format, with optional compression"),
+            ("LEGACY", "Version 2", "Uncompressed floats, for older importers"),
+        ],
+        default="CURRENT",
+    )  # type: ignore
+    compression: bpy.props.EnumProperty(
+        name="Compression",
+        description="How each record's data is compressed",
+        items=[
+            ("NONE", "None", "Store raw floats"),
+            ("ZLIB", "Deflate", "Compress each record with zlib"),
+        ],
+        default="NONE",
+    )  # type: ignore
+    compression_level: bpy.props.IntProperty(
+        name="Compression Level",
+        description="Higher levels make smaller files, but take longer to write",
+        default=6,
+        min=1,
+        max=9,
+    )  # type: ignore
+    byte_shuffle: bpy.props.BoolProperty(
+        name="Byte Shuffle",
+        description="Rearrange the bytes of each float before compressing them. Usually makes files smaller",
+        default=True,
+    )  # type: ignore
+    vertex_order: bpy.props.EnumProperty(
+        name="Vertex Order",
+        description="Which vertices each attribute holds a value for",
+        items=[
+            ("BLENDER", "Blender", "One value per Blender vertex. The importer looks each one up through the index channel"),
+            ("UNITY", "Unity", "One value per vertex of the mesh Unity imports, already split along seams, so the importer doesn't need to remap anything. Turn off mesh optimization in Unity's import settings"),
+        ],
+        default="BLENDER",
+    )  # type: ignore
+    use_cache: bpy.props.BoolProperty(
+        name="Use Cache",
+        description="Skip objects that haven't changed since the last export. Changes to objects that geometry nodes read from are not detected",
+        default=True,
+    )  # type: ignore
 
 
 scene_props = {}
@@ -159,6 +244,40 @@ scene_props["attribute_exporter_packages_index"] = bpy.props.IntProperty(
     update=refresh_attribute_choices,
 )
 
+scene_props["attribute_exporter_scoped_evaluation"] = bpy.props.BoolProperty(
+    name="Only Evaluate Exported Objects",
+    description="Evaluate exported objects in a temporary scene, so that the rest of the scene isn't re-evaluated while exporting",
+    default=False,
+)
+
+scene_props["attribute_exporter_threads"] = bpy.props.IntProperty(
+    name="Writer Threads",
+    description="How many threads encode and write data while objects are being evaluated. 0 does everything on the main thread",
+    default=4,
+    min=0,
+    max=64,
+)
+
+scene_props["attribute_exporter_chunk_size"] = bpy.props.IntProperty(
+    name="Chunk Size",
+    description="Encode and write records this many vertices at a time, reusing one buffer, so that huge meshes don't need whole records in memory. Chunked exports run on the main thread. 0 writes whole records",
+    default=0,
+    min=0,
+)
+
+scene_props["attribute_exporter_profile"] = bpy.props.BoolProperty(
+    name="Profile Exports",
+    description="Time every phase of each export and report where the time and memory went. Makes exports slower",
+    default=False,
+)
+
+scene_props["attribute_exporter_trace_path"] = bpy.props.StringProperty(
+    name="Trace File",
+    description="Where to save a detailed trace of each profiled export, which can be opened in chrome://tracing or Perfetto. Leave empty to skip it",
+    subtype="FILE_PATH",
+    default="",
+)
+
 scene_props["attribute_choices"] = bpy.props.CollectionProperty(
     name="Attribute Choices", type=AttributeExporterAttribute
 )
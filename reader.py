@@ -0,0 +1,438 @@
+"""
+Reads .attrdata files without Blender.
+
+This module only depends on the standard library (NumPy is used if it's
+there, for decoding), and doesn't import anything else from the add-on, so
+it can be copied or imported on its own by validators and other tooling.
+
+Files are memory-mapped and parsed lazily: opening a file only reads its
+header, and record payloads are handed out as views into the mapping
+rather than copies. See format.ksy for the layout.
+"""
+
+import mmap
+import struct
+import sys
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ENCODING_FLOAT32 = 0
+ENCODING_FLOAT16 = 1
+ENCODING_UNORM8 = 2
+ENCODING_UNORM16 = 3
+ENCODING_SNORM16 = 4
+
+# (numpy dtype, number of f4 range parameters per component)
+ENCODING_LAYOUTS = {
+    ENCODING_FLOAT32: ("<f4", 0),
+    ENCODING_FLOAT16: ("<f2", 0),
+    ENCODING_UNORM8: ("<u1", 2),
+    ENCODING_UNORM16: ("<u2", 2),
+    ENCODING_SNORM16: ("<i2", 1),
+}
+
+STORAGE_DENSE = 0
+STORAGE_CONSTANT = 1
+STORAGE_SPARSE = 2
+STORAGE_SHARED = 3
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+
+FILTER_NONE = 0
+FILTER_BYTE_SHUFFLE = 1
+
+VERTEX_ORDER_BLENDER = 0
+VERTEX_ORDER_SPLIT = 1
+
+
+def read_string(view: memoryview, offset: int) -> Tuple[str, int]:
+    (length,) = struct.unpack_from("<i", view, offset)
+    start = offset + 4
+    name = bytes(view[start : start + length]).decode("utf-8")
+    return name, start + length + (4 - length) % 4
+
+
+class Record:
+    """
+    A single attribute. Nothing past its header is read until it's asked for.
+
+    Shared records (version 8 onwards) hold no values of their own; they
+    name a record of another object that holds them instead. Reading their
+    values follows that reference.
+    """
+
+    view: memoryview
+    offset: int
+    length: int
+    version: int
+    file: Optional["AttrDataFile"]
+    name: str
+    vertex_count: int
+    dimensions: int
+    storage: int
+    encoding: int
+    compression: int
+    filter: int
+    payload_offset: int
+    payload_length: int
+
+    def __init__(self, view: memoryview, offset: int, version: int, file: Optional["AttrDataFile"] = None):
+        self.view = view
+        self.offset = offset
+        self.version = version
+        self.file = file
+
+        self.name, position = read_string(view, offset)
+        self.vertex_count, self.dimensions = struct.unpack_from("<ii", view, position)
+        position += 8
+
+        self.storage = STORAGE_DENSE
+        self.encoding = ENCODING_FLOAT32
+        self.compression = COMPRESSION_NONE
+        self.filter = FILTER_NONE
+
+        if version < 3:
+            self.payload_offset = position
+            self.payload_length = self.vertex_count * self.dimensions * 4
+            self.length = position + self.payload_length - offset
+            return
+
+        if version >= 6:
+            (self.storage,) = struct.unpack_from("<i", view, position)
+            position += 4
+
+        self.encoding, self.compression, self.filter, self.payload_length = struct.unpack_from(
+            "<iiii", view, position
+        )
+        self.payload_offset = position + 16
+
+        end = self.payload_offset + self.payload_length
+        self.length = end + (4 - self.payload_length % 4) % 4 - offset
+
+    @property
+    def payload(self) -> memoryview:
+        """
+        The record's payload exactly as it is stored, without copying it.
+        """
+        return self.view[self.payload_offset : self.payload_offset + self.payload_length]
+
+    @property
+    def shared(self) -> Optional[Tuple[str, str]]:
+        """
+        The object and record that hold a shared record's values, or None
+        if this record holds its own.
+        """
+        if self.storage != STORAGE_SHARED:
+            return None
+
+        obj, position = read_string(self.view, self.payload_offset)
+        name, _ = read_string(self.view, position)
+        return obj, name
+
+    def resolve(self) -> "Record":
+        """
+        The record that actually holds this record's values: this one,
+        unless it's shared.
+        """
+        shared = self.shared
+
+        if shared is None:
+            return self
+        if self.file is None:
+            raise ValueError(f"{self.name} is shared, and can only be read through its file.")
+
+        return self.file.object(shared[0]).record(shared[1])
+
+    @property
+    def is_raw(self) -> bool:
+        """
+        Whether the payload is nothing but little-endian float32 values.
+        Shared records count as raw if the record they refer to is.
+        """
+        if self.storage == STORAGE_SHARED:
+            return self.resolve().is_raw
+
+        return (
+            self.storage == STORAGE_DENSE
+            and self.encoding == ENCODING_FLOAT32
+            and self.compression == COMPRESSION_NONE
+        )
+
+    def values(self) -> memoryview:
+        """
+        The record's values as a flat memoryview of floats, without copying.
+        Only raw records can be viewed like this; use decode() for the rest.
+        """
+        if not self.is_raw:
+            raise ValueError(f"{self.name} is encoded; use decode() instead.")
+        if sys.byteorder != "little":
+            raise ValueError("Raw views are only available on little-endian machines.")
+
+        return self.resolve().payload.cast("f")
+
+    def decode(self):
+        """
+        The record's values as a NumPy float32 array of shape
+        (vertex_count, dimensions). Raw records are returned as a read-only
+        view into the file; everything else gets decoded into a new array.
+        """
+        import numpy
+
+        if self.storage == STORAGE_SHARED:
+            return self.resolve().decode()
+
+        shape = (self.vertex_count, self.dimensions)
+
+        if self.is_raw:
+            return numpy.frombuffer(self.payload, dtype="<f4").reshape(shape)
+
+        payload = self.payload
+
+        if self.compression == COMPRESSION_ZLIB:
+            payload = memoryview(zlib.decompress(payload))
+        elif self.compression != COMPRESSION_NONE:
+            raise ValueError(f"{self.name} uses an unknown compression: {self.compression}")
+
+        if self.storage == STORAGE_CONSTANT:
+            values = numpy.frombuffer(payload, dtype="<f4", count=self.dimensions)
+            return numpy.broadcast_to(values, shape)
+
+        indices = None
+        position = 0
+
+        if self.storage == STORAGE_SPARSE:
+            (count,) = struct.unpack_from("<I", payload, 0)
+            indices = numpy.frombuffer(payload, dtype="<u4", count=count, offset=4)
+            position = 4 + count * 4
+        elif self.storage != STORAGE_DENSE:
+            raise ValueError(f"{self.name} uses an unknown storage: {self.storage}")
+
+        if self.encoding not in ENCODING_LAYOUTS:
+            raise ValueError(f"{self.name} uses an unknown encoding: {self.encoding}")
+
+        dtype, param_count = ENCODING_LAYOUTS[self.encoding]
+        params = numpy.frombuffer(
+            payload, dtype="<f4", count=param_count * self.dimensions, offset=position
+        )
+        position += params.nbytes
+
+        raw = numpy.frombuffer(payload, dtype=numpy.uint8, offset=position)
+
+        if self.filter == FILTER_BYTE_SHUFFLE:
+            itemsize = numpy.dtype(dtype).itemsize
+            raw = numpy.ascontiguousarray(raw.reshape(itemsize, -1).T)
+
+        values = raw.view(dtype).astype(numpy.float64).reshape(-1, self.dimensions)
+
+        if self.encoding in (ENCODING_UNORM8, ENCODING_UNORM16):
+            steps = 255 if self.encoding == ENCODING_UNORM8 else 65535
+            low, high = params[: self.dimensions], params[self.dimensions :]
+            values = low + values / steps * (high - low)
+        elif self.encoding == ENCODING_SNORM16:
+            values = values / 32767 * params
+
+        values = values.astype(numpy.float32)
+
+        if indices is None:
+            return values
+
+        result = numpy.zeros(shape, dtype=numpy.float32)
+        result[indices] = values
+        return result
+
+
+class Object:
+    """
+    A single Blender object. Its records are found by walking their headers
+    (or through the table of contents, if the file has one).
+    """
+
+    view: memoryview
+    offset: int
+    version: int
+    name: str
+    source_uv: Tuple[int, int]
+    record_count: int
+    vertex_order: int
+    records_offset: int
+    toc: Optional[Dict[str, int]]
+    file: Optional["AttrDataFile"]
+
+    def __init__(
+        self,
+        view: memoryview,
+        offset: int,
+        version: int,
+        toc: Optional[Dict[str, int]] = None,
+        file: Optional["AttrDataFile"] = None,
+    ):
+        self.view = view
+        self.offset = offset
+        self.version = version
+        self.toc = toc
+        self.file = file
+
+        self.name, position = read_string(view, offset)
+        channel, component, self.record_count = struct.unpack_from("<iii", view, position)
+        self.source_uv = (channel, component)
+        self.records_offset = position + 12
+        self.vertex_order = VERTEX_ORDER_BLENDER
+
+        if version >= 7:
+            (self.vertex_order,) = struct.unpack_from("<i", view, self.records_offset)
+            self.records_offset += 4
+
+    def records(self) -> Iterator[Record]:
+        position = self.records_offset
+
+        for _ in range(self.record_count):
+            record = Record(self.view, position, self.version, self.file)
+            yield record
+            position += record.length
+
+    def record(self, name: str) -> Record:
+        if self.toc is not None:
+            if name not in self.toc:
+                raise KeyError(f"{self.name} has no record called {name}")
+            return Record(self.view, self.toc[name], self.version, self.file)
+
+        for record in self.records():
+            if record.name == name:
+                return record
+
+        raise KeyError(f"{self.name} has no record called {name}")
+
+    def record_names(self) -> List[str]:
+        if self.toc is not None:
+            return list(self.toc)
+        return [record.name for record in self.records()]
+
+
+class AttrDataFile:
+    """
+    A memory-mapped .attrdata file.
+
+        with AttrDataFile("Character.attrdata") as data:
+            wetness = data.object("Body").record("Wetness").decode()
+
+    Arrays and views handed out by records point into the mapping, and stay
+    valid after the file is closed; the mapping is only unmapped once the
+    last of them is gone. Objects and records can't be read any more.
+    """
+
+    path: str
+    file: object
+    mapping: Optional[mmap.mmap]
+    view: Optional[memoryview]
+    version: int
+    object_count: int
+    objects_offset: int
+    toc: Optional[Dict[str, Tuple[int, Dict[str, int]]]]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+
+        try:
+            self.mapping = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files can't be mapped
+            self.file.close()
+            raise ValueError(f"{path} is not an .attrdata file.")
+
+        self.view = memoryview(self.mapping)
+
+        if len(self.view) < 8:
+            self.close()
+            raise ValueError(f"{path} is not an .attrdata file.")
+
+        self.version, self.object_count = struct.unpack_from("<ii", self.view, 0)
+        self.objects_offset = 8
+        self.toc = None
+
+        if self.version >= 4:
+            self.read_toc()
+
+    def __enter__(self) -> "AttrDataFile":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self) -> None:
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self.mapping is not None:
+            try:
+                self.mapping.close()
+            except BufferError:
+                # records' views still point into it, so it's left for
+                # them to let go of
+                pass
+            self.mapping = None
+        self.file.close()
+
+    def check_open(self) -> None:
+        if self.view is None:
+            raise ValueError(f"{self.path} is closed.")
+
+    def read_toc(self) -> None:
+        self.toc = {}
+        position = 8
+
+        for _ in range(self.object_count):
+            name, position = read_string(self.view, position)
+            offset, length, record_count = struct.unpack_from("<QQi", self.view, position)
+            position += 20
+
+            records = {}
+
+            for _ in range(record_count):
+                record_name, position = read_string(self.view, position)
+                record_offset, record_length = struct.unpack_from("<QQ", self.view, position)
+                position += 16
+                records[record_name] = record_offset
+
+            self.toc[name] = (offset, records)
+
+        self.objects_offset = position
+
+    def objects(self) -> Iterator[Object]:
+        self.check_open()
+
+        if self.toc is not None:
+            for offset, records in self.toc.values():
+                yield Object(self.view, offset, self.version, records, self)
+            return
+
+        position = self.objects_offset
+
+        for _ in range(self.object_count):
+            obj = Object(self.view, position, self.version, file=self)
+            yield obj
+
+            position = obj.records_offset
+            for record in obj.records():
+                position += record.length
+
+    def object(self, name: str) -> Object:
+        self.check_open()
+
+        if self.toc is not None:
+            if name not in self.toc:
+                raise KeyError(f"{self.path} has no object called {name}")
+            offset, records = self.toc[name]
+            return Object(self.view, offset, self.version, records, self)
+
+        for obj in self.objects():
+            if obj.name == name:
+                return obj
+
+        raise KeyError(f"{self.path} has no object called {name}")
+
+    def object_names(self) -> List[str]:
+        if self.toc is not None:
+            return list(self.toc)
+        return [obj.name for obj in self.objects()]
@@ -0,0 +1,21 @@
+"""
+Runs the add-on against the benchmarks' stand-in for bpy, so that the
+tests don't need Blender. pytest imports the add-on's own __init__.py as
+well, which is why the stand-in has to be installed before anything else.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import fake_bpy
+
+EXPORT = fake_bpy.install()
+
+
+@pytest.fixture
+def export():
+    return EXPORT
@@ -0,0 +1,176 @@
+"""
+The export cache: its fingerprints and its size limit.
+"""
+
+import os
+from types import SimpleNamespace
+
+import numpy
+
+import fake_bpy
+from attribute_exporter.cache import ExportCache
+from attribute_exporter.writer import Writer
+
+
+class WeightedVertices(fake_bpy.ArrayData):
+    """
+    Vertices that each belong to one vertex group, and count how often
+    they're walked one by one.
+    """
+
+    def __init__(self, vertices: fake_bpy.ArrayData):
+        super().__init__(len(vertices), **vertices.arrays)
+        self.weights = numpy.ones(len(vertices), dtype=numpy.float32)
+        self.visits = 0
+
+    def __iter__(self):
+        self.visits += 1
+
+        for weight in self.weights.tolist():
+            yield SimpleNamespace(groups=[SimpleNamespace(group=0, weight=weight)])
+
+
+def make_weighted_scene(directory, modifiers):
+    context, package = fake_bpy.make_scene(str(directory), objects=1, vertices=100, attributes=1, use_cache=True)
+    obj = package.entries[0].objects[0].object
+    obj.vertex_groups = [SimpleNamespace(name="Group")]
+    obj.data.vertices = WeightedVertices(obj.data.vertices)
+    obj.modifiers = [fake_bpy.Modifier("Armature", "ARMATURE")] if modifiers else []
+
+    return context, package, obj
+
+
+def test_weights_are_skipped_without_modifiers(export, tmp_path):
+    context, package, obj = make_weighted_scene(tmp_path, modifiers=False)
+
+    export.perform_export(context, package)
+    obj.data.vertices.weights[:] = 0.5
+    result = export.perform_export(context, package)
+
+    assert obj.data.vertices.visits == 0
+    assert not result.stale
+
+    obj.vertex_groups[0].name = "Renamed"
+    result = export.perform_export(context, package)
+
+    assert result.stale == {obj}
+
+
+def test_weights_are_hashed_with_modifiers(export, tmp_path):
+    context, package, obj = make_weighted_scene(tmp_path, modifiers=True)
+
+    export.perform_export(context, package)
+    result = export.perform_export(context, package)
+
+    assert obj.data.vertices.visits == 2
+    assert not result.stale
+
+    obj.data.vertices.weights[:] = 0.5
+    result = export.perform_export(context, package)
+
+    assert result.stale == {obj}
+
+
+def make_geonodes_scene(directory):
+    context, package = fake_bpy.make_scene(str(directory), objects=2, vertices=100, attributes=1, use_cache=True)
+    tree = fake_bpy.NodeTree("Wetness")
+    obj = package.entries[0].objects[0].object
+
+    modifier = fake_bpy.Modifier("Geometry Nodes", "NODES")
+    modifier.node_group = tree
+    modifier.show_viewport = False
+    obj.modifiers = [modifier]
+
+    return context, package, obj, tree
+
+
+def test_toggled_trees_are_part_of_the_fingerprint(export, tmp_path):
+    context, package, obj, tree = make_geonodes_scene(tmp_path)
+
+    export.perform_export(context, package)
+    context.scene.toggled_geonode_trees = [SimpleNamespace(tree=tree)]
+    result = export.perform_export(context, package)
+
+    # only the object whose modifier got turned on is exported again
+    assert result.stale == {obj}
+
+    result = export.perform_export(context, package)
+
+    assert not result.stale
+
+
+def test_frame_is_part_of_the_fingerprint(export, tmp_path):
+    context, package, obj, tree = make_geonodes_scene(tmp_path)
+
+    export.perform_export(context, package)
+    context.scene.frame_current = 2
+    result = export.perform_export(context, package)
+
+    assert result.stale == {obj}
+
+
+def store_objects(cache, writer, sizes):
+    writer.write_header([(name, ["Values"]) for name in sizes])
+
+    for name, size in sizes.items():
+        store = cache.store(name, name.encode("utf-8").ljust(20, b"\x00"), writer)
+        store.begin()
+        writer.write_object(name, (1, 0), 1)
+        writer.write_record("Values", 1, numpy.arange(size, dtype=numpy.float32))
+        store.end()
+
+
+def test_size_limit_applies_to_stored_bytes(tmp_path):
+    path = str(tmp_path / "Package.attrcache")
+    sizes = {"Big": 10_000, "Small 1": 1000, "Small 2": 1000, "Small 3": 1000}
+
+    with ExportCache(path, size_limit=20_000) as cache, Writer(str(tmp_path / "Package.attrdata")) as writer:
+        store_objects(cache, writer, sizes)
+
+    with ExportCache(path) as cache:
+        assert sorted(cache.entries) == ["Small 1", "Small 2", "Small 3"]
+        assert sum(entry.length for entry in cache.entries.values()) <= 20_000
+
+    # index and trailer on top of the stored objects
+    assert os.path.getsize(path) < 20_000 + 1000
+
+
+def test_size_limit_keeps_smaller_entries_after_a_big_one(tmp_path):
+    path = str(tmp_path / "Package.attrcache")
+    output = str(tmp_path / "Package.attrdata")
+    sizes = {"Big": 10_000, "Small 1": 1000, "Small 2": 1000, "Small 3": 1000}
+
+    with ExportCache(path) as cache, Writer(output) as writer:
+        store_objects(cache, writer, sizes)
+
+    with ExportCache(path, size_limit=20_000) as cache, Writer(output) as writer:
+        cache.package_digest = b"changed"
+        writer.write_header([(name, ["Values"]) for name in sizes])
+
+        for name in sizes:
+            cache.copy(name, writer)
+
+    with ExportCache(path) as cache:
+        assert sorted(cache.entries) == ["Small 1", "Small 2", "Small 3"]
+
+
+def test_only_stale_objects_are_baked(export, tmp_path, monkeypatch):
+    context, package = fake_bpy.make_scene(str(tmp_path), objects=2, vertices=100, attributes=1, use_cache=True)
+    objects = [item.object for item in package.entries[0].objects]
+
+    export.perform_export(context, package)
+
+    baked = []
+    monkeypatch.setattr(export, "bake_vertex_ids", lambda obj, uv_layer: baked.append(obj))
+
+    # baking the first time round doesn't count as a change
+    result = export.perform_export(context, package)
+
+    assert not result.stale
+    assert baked == []
+
+    objects[1].data.attributes.get("Attribute 0").data.arrays["value"][:] = 0.5
+    result = export.perform_export(context, package)
+
+    assert result.stale == {objects[1]}
+    assert baked == [objects[1]]
@@ -0,0 +1,62 @@
+"""
+The attribute choice cache has to forget objects whose pointers get reused.
+"""
+
+from attribute_exporter.choices import AttributeChoiceCache
+from attribute_exporter.discovery import AttributeInfo
+
+
+class ID:
+    def __init__(self, pointer: int, name: str = "", data=None, session_uid: int = 0):
+        self.pointer = pointer
+        self.name_full = name
+        self.data = data
+        self.session_uid = session_uid
+
+    def as_pointer(self):
+        return self.pointer
+
+
+ATTRIBUTES = [AttributeInfo("Wetness", "POINT", "FLOAT", 1)]
+
+
+def test_remembers_objects():
+    cache = AttributeChoiceCache()
+    obj = ID(100, "Body", ID(200), session_uid=1)
+
+    assert cache.get(obj) is None
+
+    cache.store(obj, ATTRIBUTES)
+
+    assert cache.get(obj) == ATTRIBUTES
+
+
+def test_updates_forget_objects():
+    cache = AttributeChoiceCache()
+    mesh = ID(200)
+    obj = ID(100, "Body", mesh, session_uid=1)
+
+    cache.store(obj, ATTRIBUTES)
+    cache.invalidate(mesh)
+
+    assert cache.get(obj) is None
+
+
+def test_reused_pointers():
+    cache = AttributeChoiceCache()
+    cache.store(ID(100, "Body", ID(200), session_uid=1), ATTRIBUTES)
+
+    # the same pointer, after Body was deleted
+    assert cache.get(ID(100, "Hair", ID(300), session_uid=2)) is None
+    assert cache.get(ID(100, "Body", ID(300), session_uid=2)) is None
+    assert cache.get(ID(100, "Body", ID(200), session_uid=2)) is None
+
+
+def test_swapped_meshes():
+    cache = AttributeChoiceCache()
+    obj = ID(100, "Body", ID(200), session_uid=1)
+    cache.store(obj, ATTRIBUTES)
+
+    obj.data = ID(300)
+
+    assert cache.get(obj) is None
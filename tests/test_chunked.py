@@ -0,0 +1,118 @@
+"""
+Chunked exports (attribute_exporter_chunk_size > 0) have to write the same
+bytes as whole-record exports, in a bounded amount of memory.
+"""
+
+import tracemalloc
+
+import pytest
+
+import fake_bpy
+from attribute_exporter.reader import AttrDataFile
+
+VERTICES = 200_000
+
+# every record's values are read into one scratch buffer that's as big as
+# the widest attribute (FLOAT_COLOR), and the rest only depends on the chunk
+# size; the peak is one attribute's values plus a fixed amount, not a chunk.
+# Baking vertex IDs isn't chunked: it checks every corner's vertex index
+# (int32, then float32) against its UVs (2 float32s and a bool), before
+# anything is written. The fake meshes have a corner per vertex. Unity's
+# vertex order also needs a vertex map and the corner data it's worked out
+# from, so it isn't held to this limit.
+SCRATCH_BYTES = VERTICES * 4 * 4
+BAKE_BYTES = VERTICES * (4 + 4 + 8 + 1)
+FIXED_BYTES = 1024 * 1024
+
+
+def make_varied_scene(directory, vertices, chunk_size, **kwargs):
+    """
+    A scene whose records come out constant, sparse and dense.
+    """
+    context, package = fake_bpy.make_scene(str(directory), objects=2, vertices=vertices, attributes=6, **kwargs)
+    context.scene.attribute_exporter_chunk_size = chunk_size
+
+    for item in package.entries[0].objects:
+        attributes = item.object.data.attributes
+
+        for index, attribute in enumerate(attributes[:3]):
+            (values,) = attribute.data.arrays.values()
+
+            if index == 0:
+                values[:] = 0.25
+            elif index == 1:
+                values[:] = 0
+                values[::97] = 1.5
+            else:
+                values[values < 0.9] = 0
+
+    return context, package
+
+
+def export_bytes(export, directory, chunk_size, modifiers=False, **kwargs):
+    context, package = make_varied_scene(directory, 5000, chunk_size, **kwargs)
+
+    if modifiers:
+        # instances with modifiers are only shared by their records' contents
+        for item in package.entries[0].objects:
+            item.object.modifiers = [fake_bpy.Modifier("Subdivision")]
+
+    result = export.perform_export(context, package)
+
+    with open(result.filepath, "rb") as file:
+        return file.read()
+
+
+@pytest.mark.parametrize("vertex_order", ["BLENDER", "UNITY"])
+@pytest.mark.parametrize(
+    "encoding, compression",
+    [("FLOAT32", "NONE"), ("FLOAT32", "ZLIB"), ("UNORM16", "ZLIB"), ("SNORM16", "NONE"), ("FLOAT16", "ZLIB")],
+)
+def test_chunked_bytes_match(export, tmp_path, encoding, compression, vertex_order):
+    settings = dict(encoding=encoding, compression=compression, vertex_order=vertex_order)
+    outputs = []
+
+    for chunk_size in (0, 1000, 33):
+        directory = tmp_path / str(chunk_size)
+        directory.mkdir()
+        outputs.append(export_bytes(export, directory, chunk_size, **settings))
+
+    assert outputs[1] == outputs[0]
+    assert outputs[2] == outputs[0]
+
+
+@pytest.mark.parametrize("modifiers", [False, True])
+def test_chunked_instances_match(export, tmp_path, modifiers):
+    outputs = []
+
+    for chunk_size in (0, 1000, 33):
+        directory = tmp_path / str(chunk_size)
+        directory.mkdir()
+        outputs.append(export_bytes(export, directory, chunk_size, modifiers, encoding="UNORM16", instances=2))
+
+    assert outputs[1] == outputs[0]
+    assert outputs[2] == outputs[0]
+
+    with AttrDataFile(str(tmp_path / "33" / "Benchmark.attrdata")) as file:
+        for obj in file.objects():
+            for record in obj.records():
+                expected = (obj.name[: -len(".001")], record.name) if obj.name.endswith(".001") else None
+                assert record.shared == expected
+
+
+def test_chunked_peak_memory(export, tmp_path):
+    context, package = make_varied_scene(tmp_path, VERTICES, 4096, encoding="UNORM16", compression="ZLIB")
+
+    # the first export adds the UV map that vertex IDs are baked into, which
+    # belongs to the mesh from then on
+    export.perform_export(context, package)
+
+    tracemalloc.start()
+
+    try:
+        export.perform_export(context, package)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert peak < max(SCRATCH_BYTES, BAKE_BYTES) + FIXED_BYTES
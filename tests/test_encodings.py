@@ -0,0 +1,212 @@
+"""
+Record encodings and storage, written with the Writer and read back with
+the reader.
+"""
+
+import numpy
+import pytest
+
+from attribute_exporter.reader import AttrDataFile
+from attribute_exporter.writer import (
+    ENCODING_FLOAT16,
+    ENCODING_FLOAT32,
+    ENCODING_SNORM16,
+    ENCODING_UNORM16,
+    ENCODING_UNORM8,
+    STORAGE_CONSTANT,
+    STORAGE_DENSE,
+    STORAGE_SPARSE,
+    FormatSettings,
+    Writer,
+)
+
+DIMENSIONS = 3
+
+
+def round_trip(directory, data, dimensions, encoding, settings=FormatSettings()):
+    """
+    Writes a single record and reads it back. Returns the record's storage,
+    encoding and decoded values.
+    """
+    path = str(directory / "Test.attrdata")
+
+    with Writer(path, settings) as writer:
+        writer.write_header([("Object", ["Values"])])
+        writer.write_object("Object", (1, 0), 1)
+        writer.write_record("Values", dimensions, numpy.asarray(data, dtype=numpy.float32).ravel(), encoding)
+
+    with AttrDataFile(path) as file:
+        record = file.object("Object").record("Values")
+        return record.storage, record.encoding, numpy.array(record.decode())
+
+
+def make_values(count=1000, seed=0):
+    """
+    Values with a different range in each component.
+    """
+    rng = numpy.random.default_rng(seed)
+    return (rng.random((count, DIMENSIONS)) * [10, 1, 0.01] - [5, 0, 0.005]).astype(numpy.float32)
+
+
+@pytest.mark.parametrize(
+    "encoding, steps",
+    [(ENCODING_UNORM8, 255), (ENCODING_UNORM16, 65535)],
+)
+def test_unorm_stays_within_half_a_step(tmp_path, encoding, steps):
+    values = make_values()
+    _, stored, decoded = round_trip(tmp_path, values, DIMENSIONS, encoding)
+
+    low, high = values.min(axis=0), values.max(axis=0)
+
+    assert stored == encoding
+    # half a step, give or take float32 rounding
+    assert numpy.all(numpy.abs(decoded - values) <= (high - low) / steps / 2 * 1.01)
+    # the ends of the range come back exactly
+    assert numpy.array_equal(decoded.min(axis=0), low)
+    assert numpy.allclose(decoded.max(axis=0), high, rtol=1e-6)
+
+
+def test_snorm16_stays_within_half_a_step(tmp_path):
+    values = make_values()
+    _, stored, decoded = round_trip(tmp_path, values, DIMENSIONS, ENCODING_SNORM16)
+
+    magnitude = numpy.abs(values).max(axis=0)
+
+    assert stored == ENCODING_SNORM16
+    assert numpy.all(numpy.abs(decoded - values) <= magnitude / 32767 / 2 * 1.01)
+
+
+def test_float16_matches_numpy(tmp_path):
+    values = make_values()
+    _, stored, decoded = round_trip(tmp_path, values, DIMENSIONS, ENCODING_FLOAT16)
+
+    assert stored == ENCODING_FLOAT16
+    assert numpy.array_equal(decoded, values.astype(numpy.float16).astype(numpy.float32))
+
+
+def test_float32_is_exact(tmp_path):
+    values = make_values()
+    _, stored, decoded = round_trip(tmp_path, values, DIMENSIONS, ENCODING_FLOAT32)
+
+    assert stored == ENCODING_FLOAT32
+    assert numpy.array_equal(decoded, values)
+
+
+def test_older_versions_ignore_the_encoding(tmp_path):
+    values = make_values()
+    _, stored, decoded = round_trip(tmp_path, values, DIMENSIONS, ENCODING_UNORM8, FormatSettings(version=4))
+
+    assert stored == ENCODING_FLOAT32
+    assert numpy.array_equal(decoded, values)
+
+
+@pytest.mark.parametrize("encoding", [ENCODING_UNORM8, ENCODING_UNORM16, ENCODING_SNORM16])
+def test_constant_components_come_back_exactly(tmp_path, encoding):
+    values = make_values()
+    values[:, 1] = 0.75
+    values[:, 2] = 0
+
+    _, _, decoded = round_trip(tmp_path, values, DIMENSIONS, encoding)
+
+    assert numpy.all(decoded[:, 1] == 0.75)
+    assert numpy.all(decoded[:, 2] == 0)
+
+
+@pytest.mark.parametrize("encoding", [ENCODING_UNORM16, ENCODING_SNORM16])
+def test_nan_doesnt_spoil_the_range(tmp_path, encoding):
+    values = make_values()
+    values[10, 0] = numpy.nan
+    values[:, 2] = numpy.nan
+
+    _, _, decoded = round_trip(tmp_path, values, DIMENSIONS, encoding)
+
+    finite = numpy.ones(len(values), dtype=bool)
+    finite[10] = False
+
+    assert numpy.allclose(decoded[finite, :2], values[finite, :2], atol=1e-3)
+    # NaN can't be quantized, so it becomes the bottom of the range
+    expected = values[finite, 0].min() if encoding == ENCODING_UNORM16 else 0
+    assert decoded[10, 0] == expected
+    # a component with nothing but NaN stays NaN
+    assert numpy.isnan(decoded[:, 2]).all()
+
+
+def same_bits(first, second):
+    return numpy.array_equal(
+        numpy.asarray(first, dtype="<f4").view(numpy.uint32), numpy.asarray(second, dtype="<f4").view(numpy.uint32)
+    )
+
+
+@pytest.mark.parametrize("encoding", [ENCODING_FLOAT32, ENCODING_FLOAT16, ENCODING_UNORM8, ENCODING_SNORM16])
+@pytest.mark.parametrize("value", [0.0, -0.0, 0.3, numpy.nan])
+def test_constant_records_are_stored_once(tmp_path, encoding, value):
+    values = numpy.full((1000, DIMENSIONS), value, dtype=numpy.float32)
+    storage, stored, decoded = round_trip(tmp_path, values, DIMENSIONS, encoding)
+
+    # constant values are always stored as they are, whatever the encoding
+    assert storage == STORAGE_CONSTANT
+    assert stored == ENCODING_FLOAT32
+    assert same_bits(decoded, values)
+
+
+def test_mixed_zeros_arent_constant(tmp_path):
+    values = numpy.zeros((1000, 1), dtype=numpy.float32)
+    values[::2] = -0.0
+
+    storage, _, decoded = round_trip(tmp_path, values, 1, ENCODING_FLOAT32)
+
+    assert storage != STORAGE_CONSTANT
+    assert same_bits(decoded, values)
+
+
+def test_sparse_records_keep_negative_zero(tmp_path):
+    values = numpy.zeros((1000, DIMENSIONS), dtype=numpy.float32)
+    values[5] = [1, 2, 3]
+    values[50] = -0.0
+    values[500, 1] = -0.0
+
+    storage, _, decoded = round_trip(tmp_path, values, DIMENSIONS, ENCODING_FLOAT32)
+
+    assert storage == STORAGE_SPARSE
+    assert same_bits(decoded, values)
+
+
+@pytest.mark.parametrize("encoding", [ENCODING_UNORM8, ENCODING_UNORM16, ENCODING_SNORM16])
+def test_sparse_records_quantize_what_is_there(tmp_path, encoding):
+    values = numpy.zeros((1000, DIMENSIONS), dtype=numpy.float32)
+    values[::100] = make_values(10)
+
+    storage, stored, decoded = round_trip(tmp_path, values, DIMENSIONS, encoding)
+
+    assert storage == STORAGE_SPARSE
+    assert stored == encoding
+    assert numpy.all(decoded[values.any(axis=1) == 0] == 0)
+    # within half a step of UNORM8 over the widest component's range
+    assert numpy.allclose(decoded, values, atol=10 / 255 / 2 * 1.01)
+
+
+@pytest.mark.parametrize(
+    "encoding, dimensions, largest_sparse",
+    [
+        # 4 + count * (4 + dimensions * size) has to be smaller than the dense size
+        (ENCODING_FLOAT32, 3, 74),
+        (ENCODING_UNORM8, 1, 19),
+        (ENCODING_UNORM16, 4, 66),
+    ],
+)
+def test_sparse_storage_threshold(tmp_path, encoding, dimensions, largest_sparse):
+    for count, expected in [(largest_sparse, STORAGE_SPARSE), (largest_sparse + 1, STORAGE_DENSE)]:
+        values = numpy.zeros((100, dimensions), dtype=numpy.float32)
+        values[:count] = numpy.linspace(1, 2, count * dimensions).reshape(count, dimensions)
+
+        storage, _, decoded = round_trip(tmp_path, values, dimensions, encoding)
+
+        assert storage == expected
+        assert numpy.allclose(decoded, values, atol=1e-2)
+
+
+def test_empty_records_are_dense(tmp_path):
+    storage, _, decoded = round_trip(tmp_path, numpy.empty((0, DIMENSIONS)), DIMENSIONS, ENCODING_UNORM16)
+
+    assert storage == STORAGE_DENSE
+    assert decoded.shape == (0, DIMENSIONS)
@@ -0,0 +1,31 @@
+"""
+How often exports make Blender update the scene.
+"""
+
+from types import SimpleNamespace
+
+import fake_bpy
+
+
+def test_nothing_toggled_means_no_updates(export, tmp_path):
+    context, package = fake_bpy.make_scene(str(tmp_path), objects=2, vertices=100, attributes=1)
+
+    export.perform_export(context, package)
+
+    assert context.view_layer.updates == 0
+
+
+def test_toggled_geonodes_update_once_each_way(export, tmp_path):
+    context, package = fake_bpy.make_scene(str(tmp_path), objects=2, vertices=100, attributes=1)
+    tree = fake_bpy.NodeTree("Tree")
+    context.scene.toggled_geonode_trees = [SimpleNamespace(tree=tree)]
+
+    modifier = fake_bpy.Modifier("Geometry Nodes", "NODES")
+    modifier.node_group = tree
+    modifier.show_viewport = False
+    package.entries[0].objects[0].object.modifiers = [modifier]
+
+    export.perform_export(context, package)
+
+    assert context.view_layer.updates == 2
+    assert not modifier.show_viewport
@@ -0,0 +1,103 @@
+"""
+The pipeline has to deliver every job in the order it was submitted, no
+matter when its encode step finishes.
+"""
+
+import threading
+import time
+
+import pytest
+
+import fake_bpy
+from attribute_exporter.pipeline import Pipeline
+
+
+def slow_encode(index: int, delay: float):
+    def encode():
+        time.sleep(delay)
+        return index
+
+    return encode
+
+
+@pytest.mark.parametrize("workers", [0, 1, 4])
+def test_delivers_in_submission_order(workers):
+    delivered = []
+
+    with Pipeline(workers) as pipeline:
+        for index in range(20):
+            # later jobs finish encoding first
+            pipeline.submit(slow_encode(index, (20 - index) * 0.002), delivered.append)
+            pipeline.submit(None, lambda index=index: delivered.append(-index))
+
+    assert delivered == [value for index in range(20) for value in (index, -index)]
+
+
+@pytest.mark.parametrize("failing", ["encode", "deliver"])
+def test_errors_reach_the_submitter(failing):
+    delivered = []
+
+    def fail(*args):
+        raise ValueError("Broken")
+
+    with pytest.raises(ValueError, match="Broken"):
+        with Pipeline(2) as pipeline:
+            pipeline.submit(slow_encode(0, 0), delivered.append)
+
+            if failing == "encode":
+                pipeline.submit(fail, delivered.append)
+            else:
+                pipeline.submit(slow_encode(1, 0), fail)
+
+            for index in range(2, 10):
+                pipeline.submit(slow_encode(index, 0), delivered.append)
+
+    # nothing after the failed job gets delivered
+    assert delivered == [0]
+
+
+def test_max_pending_blocks_submit():
+    gate = threading.Event()
+    delivered = []
+    submitted = []
+
+    def deliver(value):
+        gate.wait()
+        delivered.append(value)
+
+    def submit_all(pipeline):
+        for index in range(10):
+            pipeline.submit(slow_encode(index, 0), deliver)
+            submitted.append(index)
+
+    with Pipeline(2, max_pending=2) as pipeline:
+        submitter = threading.Thread(target=submit_all, args=(pipeline,))
+        submitter.start()
+        time.sleep(0.2)
+
+        # one job is being delivered and two are waiting behind it
+        assert len(submitted) == 3
+
+        gate.set()
+        submitter.join()
+
+    assert delivered == list(range(10))
+
+
+@pytest.mark.parametrize("compression", ["NONE", "ZLIB"])
+def test_threads_write_the_same_bytes(export, tmp_path, compression):
+    outputs = []
+
+    for threads in (0, 4):
+        directory = tmp_path / str(threads)
+        directory.mkdir()
+        context, package = fake_bpy.make_scene(
+            str(directory), objects=3, vertices=2000, attributes=4, threads=threads, compression=compression
+        )
+
+        result = export.perform_export(context, package)
+
+        with open(result.filepath, "rb") as file:
+            outputs.append(file.read())
+
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,103 @@
+"""
+Every problem with an export is reported at once, before anything in the
+scene is changed or any file is written.
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import fake_bpy
+
+
+def make_broken_scene(directory):
+    """
+    A scene with a problem that's found before evaluating anything (Object 0
+    has no Missing attribute) and one that's only found after (Object 1 has
+    a modifier, and no Evaluated attribute).
+    """
+    context, package = fake_bpy.make_scene(directory, objects=2, vertices=100, attributes=1)
+    first, second = [item.object for item in package.entries[0].objects]
+
+    tree = fake_bpy.NodeTree("Tree")
+    context.scene.toggled_geonode_trees = [SimpleNamespace(tree=tree)]
+
+    modifier = fake_bpy.Modifier("Geometry Nodes", "NODES")
+    modifier.node_group = tree
+    modifier.show_viewport = False
+    second.modifiers = [modifier]
+
+    package.entries += [
+        fake_bpy.Entry([first], ["Missing"], "FLOAT32"),
+        fake_bpy.Entry([second], ["Evaluated"], "FLOAT32"),
+    ]
+
+    return context, package, modifier
+
+
+def test_problems_are_reported_together(export, tmp_path):
+    context, package, _ = make_broken_scene(str(tmp_path))
+
+    with pytest.raises(ValueError) as error:
+        export.perform_export(context, package)
+
+    message = str(error.value)
+
+    assert message.startswith("Found 2 problems:")
+    assert "Object 0" in message and "Missing" in message
+    assert "Object 1" in message and "Evaluated" in message
+
+
+def test_evaluated_objects_are_checked_with_geonodes_on(export, tmp_path, monkeypatch):
+    context, package, modifier = make_broken_scene(str(tmp_path))
+    discover_attributes = export.discover_attributes
+    enabled = []
+
+    def spy(objects, depsgraph):
+        enabled.append(modifier.show_viewport)
+        return discover_attributes(objects, depsgraph)
+
+    monkeypatch.setattr(export, "discover_attributes", spy)
+
+    with pytest.raises(ValueError):
+        export.perform_export(context, package)
+
+    assert enabled == [True]
+    assert not modifier.show_viewport
+
+
+def test_problems_leave_the_scene_alone(export, tmp_path, monkeypatch):
+    context, package, modifier = make_broken_scene(str(tmp_path))
+    objects = [item.object for item in package.entries[0].objects]
+    prepared = []
+
+    monkeypatch.setattr(export, "prepare_object", lambda *args: prepared.append(args))
+
+    with pytest.raises(ValueError):
+        export.perform_export(context, package)
+
+    assert prepared == []
+    assert [len(obj.data.uv_layers) for obj in objects] == [1, 1]
+    assert [obj.modifiers for obj in objects] == [[], [modifier]]
+    assert os.listdir(tmp_path) == []
+
+
+def test_only_changes_are_evaluated_again(export, tmp_path):
+    context, package = fake_bpy.make_scene(str(tmp_path), objects=2, vertices=100, attributes=1)
+    depsgraph = context.view_layer.depsgraph
+    mesh = package.entries[0].objects[0].object.data
+
+    # the first export adds a UV map for the vertex IDs, and bakes them
+    export.perform_export(context, package)
+
+    assert len(mesh.uv_layers) == 2
+    assert mesh.tagged
+    assert depsgraph.updates == 1
+
+    # after that, there's nothing to change
+    mesh.tagged = False
+    export.perform_export(context, package)
+
+    assert not mesh.tagged
+    assert depsgraph.updates == 1
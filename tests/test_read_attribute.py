@@ -0,0 +1,67 @@
+"""
+read_attribute() and encode_record() have to produce exactly the bytes
+that the old per-vertex bmesh loop did.
+"""
+
+import struct
+
+import numpy
+import pytest
+
+import fake_bpy
+from attribute_exporter.writer import LEGACY_FORMAT_VERSION, FormatSettings, encode_record
+
+VERTEX_COUNT = 1000
+
+
+def pack_per_vertex(name: str, dimensions: int, per_vertex: list) -> bytes:
+    """
+    The record that write_attribute() used to build from bm.verts.
+    """
+    encoded_name = name.encode("utf-8")
+
+    output = struct.pack("<i", len(encoded_name))
+    output += encoded_name
+    output += b"\x00" * ((4 - len(encoded_name)) % 4)
+    output += struct.pack("<i", len(per_vertex))
+    output += struct.pack("<i", dimensions)
+
+    colors = [0] * dimensions * len(per_vertex)
+
+    for item_index, item in enumerate(per_vertex):
+        if dimensions == 1:
+            colors[item_index] = item
+        else:
+            for dim, color in enumerate(item):
+                colors[item_index * dimensions + dim] = color
+
+    for item in colors:
+        output += struct.pack("<f", item)
+
+    return output
+
+
+@pytest.mark.parametrize("data_type, key, dimensions", fake_bpy.ATTRIBUTE_TYPES)
+def test_bytes_match_bmesh_loop(export, data_type, key, dimensions):
+    rng = numpy.random.default_rng(0)
+    mesh = fake_bpy.Mesh("Mesh", VERTEX_COUNT, 0, rng)
+    obj = fake_bpy.Object("Object", mesh)
+
+    values = (rng.standard_normal(VERTEX_COUNT * dimensions) * 1000).astype(numpy.float32)
+    # values that are easy to get wrong on the way through Python floats
+    values[:6] = [0.0, -0.0, numpy.inf, -numpy.inf, 1e-45, numpy.finfo(numpy.float32).max]
+
+    name = "Attribute Ä"
+    attribute = fake_bpy.Attribute(name, data_type, key, dimensions, VERTEX_COUNT, rng)
+    attribute.data.arrays[key] = values
+    mesh.attributes.append(attribute)
+
+    # bmesh handed out a float per vertex, or a vector of them
+    rows = values.reshape(VERTEX_COUNT, dimensions).tolist()
+    per_vertex = [row[0] for row in rows] if dimensions == 1 else [tuple(row) for row in rows]
+
+    read_dimensions, data = export.read_attribute(obj, mesh, name)
+    buffers = encode_record(name, read_dimensions, data, FormatSettings(version=LEGACY_FORMAT_VERSION))
+
+    assert read_dimensions == dimensions
+    assert b"".join(bytes(buffer) for buffer in buffers) == pack_per_vertex(name, dimensions, per_vertex)
@@ -0,0 +1,147 @@
+"""
+Reading .attrdata files back with the standalone reader.
+"""
+
+import numpy
+import pytest
+
+import fake_bpy
+from attribute_exporter.reader import AttrDataFile
+from attribute_exporter.writer import (
+    COMPRESSION_ZLIB,
+    ENCODING_FLOAT32,
+    ENCODING_UNORM16,
+    FILTER_BYTE_SHUFFLE,
+    LEGACY_FORMAT_VERSION,
+    FormatSettings,
+    Writer,
+)
+
+RECORDS = {"Color": 4, "Offset": 3, "Weight": 1}
+
+
+def make_objects(seed=0):
+    rng = numpy.random.default_rng(seed)
+    return {
+        name: {record: rng.random((50 + index, dimensions), dtype=numpy.float32) for record, dimensions in RECORDS.items()}
+        for index, name in enumerate(["Body", "Hair", "Ümlaut"])
+    }
+
+
+def write_file(path, objects, settings, encoding=ENCODING_FLOAT32):
+    with Writer(path, settings) as writer:
+        writer.write_header([(name, sorted(records)) for name, records in objects.items()])
+
+        for name, records in objects.items():
+            writer.write_object(name, (1, 0), len(records))
+
+            for record in sorted(records):
+                values = records[record]
+                writer.write_record(record, values.shape[1], values.ravel(), encoding)
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [
+        FormatSettings(version=LEGACY_FORMAT_VERSION),
+        FormatSettings(version=3, compression=COMPRESSION_ZLIB),
+        FormatSettings(version=4),
+        FormatSettings(compression=COMPRESSION_ZLIB, filter=FILTER_BYTE_SHUFFLE),
+        FormatSettings(),
+    ],
+)
+def test_round_trip(tmp_path, settings):
+    path = str(tmp_path / "Test.attrdata")
+    objects = make_objects()
+    write_file(path, objects, settings)
+
+    with AttrDataFile(path) as file:
+        assert file.version == settings.version
+        assert file.object_names() == list(objects)
+
+        for obj in file.objects():
+            assert obj.source_uv == (1, 0)
+            assert obj.record_names() == sorted(RECORDS)
+
+            for record in obj.records():
+                assert record.dimensions == RECORDS[record.name]
+                assert numpy.array_equal(record.decode(), objects[obj.name][record.name])
+
+        # looked up by name, with or without a table of contents
+        assert numpy.array_equal(file.object("Hair").record("Offset").decode(), objects["Hair"]["Offset"])
+
+
+def test_raw_records_are_views(tmp_path):
+    path = str(tmp_path / "Test.attrdata")
+    objects = make_objects()
+    write_file(path, objects, FormatSettings())
+
+    with AttrDataFile(path) as file:
+        record = file.object("Body").record("Color")
+
+        assert record.is_raw
+        assert numpy.array_equal(numpy.frombuffer(record.values(), dtype=numpy.float32), objects["Body"]["Color"].ravel())
+        assert not record.decode().flags.writeable
+
+
+def test_decoded_records_outlive_the_file(tmp_path):
+    path = str(tmp_path / "Test.attrdata")
+    objects = make_objects()
+    write_file(path, objects, FormatSettings())
+
+    with AttrDataFile(path) as file:
+        color = file.object("Body").record("Color").decode()
+        values = file.object("Hair").record("Weight").values()
+
+    assert numpy.array_equal(color, objects["Body"]["Color"])
+    assert numpy.array_equal(numpy.frombuffer(values, dtype=numpy.float32), objects["Hair"]["Weight"].ravel())
+
+    with pytest.raises(ValueError):
+        file.object("Body")
+
+
+def test_encoded_records_need_decoding(tmp_path):
+    path = str(tmp_path / "Test.attrdata")
+    write_file(path, make_objects(), FormatSettings(), ENCODING_UNORM16)
+
+    with AttrDataFile(path) as file:
+        record = file.object("Body").record("Color")
+
+        assert not record.is_raw
+        with pytest.raises(ValueError):
+            record.values()
+
+
+def test_missing_names(tmp_path):
+    path = str(tmp_path / "Test.attrdata")
+    write_file(path, make_objects(), FormatSettings())
+
+    with AttrDataFile(path) as file:
+        with pytest.raises(KeyError):
+            file.object("Nobody")
+        with pytest.raises(KeyError):
+            file.object("Body").record("Nothing")
+
+
+def test_not_an_attrdata_file(tmp_path):
+    for contents in [b"", b"1234"]:
+        path = tmp_path / "Broken.attrdata"
+        path.write_bytes(contents)
+
+        with pytest.raises(ValueError):
+            AttrDataFile(str(path))
+
+
+def test_reads_an_export(export, tmp_path):
+    context, package = fake_bpy.make_scene(str(tmp_path), objects=2, vertices=100, attributes=3)
+    result = export.perform_export(context, package)
+
+    with AttrDataFile(result.filepath) as file:
+        for item in package.entries[0].objects:
+            obj = item.object
+
+            for attribute in obj.data.attributes:
+                (values,) = attribute.data.arrays.values()
+                decoded = file.object(obj.name).record(attribute.name).decode()
+
+                assert numpy.array_equal(decoded.ravel(), values)
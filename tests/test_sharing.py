@@ -0,0 +1,76 @@
+"""
+Records shared between objects that share a mesh (format version 8).
+"""
+
+import fake_bpy
+from attribute_exporter.reader import AttrDataFile
+
+ATTRIBUTE = "Attribute 0"
+
+
+def make_instanced_scene(directory):
+    """
+    Two meshes with two objects each, and identical constant attributes.
+    Every object has a modifier, so instances are only shared by content.
+    """
+    context, package = fake_bpy.make_scene(
+        str(directory), objects=2, vertices=100, attributes=1, instances=2, use_cache=True
+    )
+
+    objects = [item.object for item in package.entries[0].objects]
+
+    for obj in objects:
+        obj.modifiers = [fake_bpy.Modifier("Subdivision")]
+        obj.data.attributes.get(ATTRIBUTE).data.arrays["value"][:] = 1.0
+
+    return context, package, {obj.name: obj for obj in objects}
+
+
+def read_values(path):
+    with AttrDataFile(path) as file:
+        return {
+            name: float(file.object(name).record(ATTRIBUTE).decode()[0, 0]) for name in file.object_names()
+        }
+
+
+def read_shares(path):
+    with AttrDataFile(path) as file:
+        return {name: file.object(name).record(ATTRIBUTE).shared for name in file.object_names()}
+
+
+def test_identical_records_are_shared_within_a_mesh(export, tmp_path):
+    context, package, objects = make_instanced_scene(tmp_path)
+
+    result = export.perform_export(context, package)
+
+    assert read_shares(result.filepath) == {
+        "Object 0": None,
+        "Object 0.001": ("Object 0", ATTRIBUTE),
+        "Object 1": None,
+        "Object 1.001": ("Object 1", ATTRIBUTE),
+    }
+
+
+def test_cached_records_never_refer_to_another_mesh(export, tmp_path):
+    context, package, objects = make_instanced_scene(tmp_path)
+    export.perform_export(context, package)
+
+    objects["Object 0"].data.attributes.get(ATTRIBUTE).data.arrays["value"][:] = 2.0
+    result = export.perform_export(context, package)
+
+    assert result.stale == {objects["Object 0"], objects["Object 0.001"]}
+    assert read_values(result.filepath) == {
+        "Object 0": 2.0,
+        "Object 0.001": 2.0,
+        "Object 1": 1.0,
+        "Object 1.001": 1.0,
+    }
+
+    # dropping the object that others used to refer to leaves nothing dangling
+    package.entries[0].objects = [
+        item for item in package.entries[0].objects if item.object is not objects["Object 0"]
+    ]
+    result = export.perform_export(context, package)
+
+    assert read_values(result.filepath) == {"Object 0.001": 2.0, "Object 1": 1.0, "Object 1.001": 1.0}
+
@@ -0,0 +1,129 @@
+"""
+split_vertices() has to come up with the same vertices, in the same order,
+as Unity does when it imports the mesh.
+"""
+
+from types import SimpleNamespace
+
+import numpy
+import pytest
+
+import fake_bpy
+
+#   0 - 1 - 2 - 3
+#   | A | B | C |
+#   4 - 5 - 6 - 7
+#   | D | E | F |
+#   8 - 9 -10 -11
+#
+# There's a UV seam down the 1-5-9 column and a hard edge down the 2-6-10
+# column, so each of those vertices is split in two.
+FACES = {
+    "A": (0, 1, 5, 4),
+    "B": (1, 2, 6, 5),
+    "C": (2, 3, 7, 6),
+    "D": (4, 5, 9, 8),
+    "E": (5, 6, 10, 9),
+    "F": (6, 7, 11, 10),
+}
+SEAM_SIDE = "BCEF"
+HARD_SIDE = "CF"
+
+# the first corner of each distinct vertex/normal/UV combination, in
+# corner order
+EXPECTED = [0, 1, 5, 4, 1, 2, 6, 5, 2, 3, 7, 6, 9, 8, 10, 9, 11, 10]
+
+
+def make_mesh(legacy_normals=False, color_domain="CORNER"):
+    vertex_index = numpy.array([vertex for face in FACES.values() for vertex in face], dtype=numpy.int32)
+    loop_count = len(vertex_index)
+
+    normals = numpy.zeros((loop_count, 3), dtype=numpy.float32)
+    uvs = numpy.zeros((loop_count, 2), dtype=numpy.float32)
+
+    for index, (face, vertices) in enumerate(FACES.items()):
+        for corner, vertex in enumerate(vertices):
+            loop = index * 4 + corner
+            normals[loop] = (1, 0, 0) if face in HARD_SIDE else (0, 0, 1)
+            uvs[loop] = (vertex % 4 * 0.25 + (0.5 if face in SEAM_SIDE else 0), vertex // 4 * 0.5)
+
+    # -0.0 is the same normal as 0.0, and mustn't split vertex 5
+    normals[FACES["D"].index(5) + 12, 0] = -0.0
+
+    mesh = SimpleNamespace(
+        loops=fake_bpy.ArrayData(loop_count, vertex_index=vertex_index, normal=normals.ravel()),
+        uv_layers=fake_bpy.UVLayers(loop_count),
+        color_attributes=[
+            SimpleNamespace(
+                domain=color_domain,
+                data=fake_bpy.ArrayData(loop_count, color=numpy.ones(loop_count * 4, dtype=numpy.float32)),
+            )
+        ],
+    )
+    mesh.uv_layers.new().data.foreach_set("uv", uvs.ravel())
+    # a second, unseamed UV map doesn't split anything
+    mesh.uv_layers.new("Lightmap").data.foreach_set("uv", uvs.ravel() % 0.5)
+
+    if legacy_normals:
+        mesh.calc_normals_split = lambda: None
+    else:
+        mesh.corner_normals = fake_bpy.ArrayData(loop_count, vector=normals.ravel())
+
+    return mesh
+
+
+@pytest.mark.parametrize("legacy_normals", [False, True])
+def test_seams_and_hard_edges(export, legacy_normals):
+    mesh = make_mesh(legacy_normals)
+
+    split = export.split_vertices(mesh)
+
+    assert split.tolist() == EXPECTED
+
+
+def test_every_corner_has_its_vertex(export):
+    mesh = make_mesh()
+    split = export.split_vertices(mesh)
+
+    vertex_index = mesh.loops.arrays["vertex_index"]
+    normals = mesh.loops.arrays["normal"].reshape(-1, 3) + numpy.float32(0)
+    uvs = mesh.uv_layers[0].data.arrays["uv"].reshape(-1, 2)
+
+    # the corner each of Unity's vertices was made from
+    first_corners = []
+    corners = {}
+
+    for loop, vertex in enumerate(vertex_index):
+        key = (vertex, *normals[loop], *uvs[loop])
+        if key not in corners:
+            corners[key] = len(first_corners)
+            first_corners.append(loop)
+
+    assert len(split) == len(first_corners)
+    assert split.tolist() == vertex_index[first_corners].tolist()
+
+    # every corner lands on a vertex that came from the same Blender vertex
+    for loop, vertex in enumerate(vertex_index):
+        key = (vertex, *normals[loop], *uvs[loop])
+        assert split[corners[key]] == vertex
+
+
+def test_point_colors_do_not_split(export):
+    mesh = make_mesh(color_domain="POINT")
+    mesh.color_attributes[0].data.arrays["color"][:4] = 0
+
+    assert export.split_vertices(mesh).tolist() == EXPECTED
+
+
+def test_corner_colors_split(export):
+    mesh = make_mesh()
+    # vertex 1's corner in face A is the only one with its UVs already
+    mesh.color_attributes[0].data.arrays["color"][4:8] = 0
+
+    assert export.split_vertices(mesh).tolist() == EXPECTED
+
+    # vertex 4 is shared by faces A and D; recolouring its corner in D
+    # splits it
+    mesh.color_attributes[0].data.arrays["color"][(12 + 0) * 4 : (12 + 1) * 4] = 0
+
+    assert export.split_vertices(mesh).tolist() == EXPECTED[:12] + [4] + EXPECTED[12:]
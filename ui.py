@@ -85,6 +85,13 @@ class AttributeExporterRootPanel(bpy.types.Panel):
         else:
             layout.label(text=f"Packages: {len(context.scene.attribute_exporter_packages)}")
             layout.operator("attribute_exporter.export_all")
+            layout.prop(context.scene, "attribute_exporter_scoped_evaluation")
+            layout.prop(context.scene, "attribute_exporter_threads")
+            layout.prop(context.scene, "attribute_exporter_chunk_size")
+            layout.prop(context.scene, "attribute_exporter_profile")
+
+            if context.scene.attribute_exporter_profile:
+                layout.prop(context.scene, "attribute_exporter_trace_path")
 
 
 class AttributeExporterScenePanel(bpy.types.Panel):
@@ -156,6 +163,17 @@ class AttributeExporterPackagePanel(bpy.types.Panel):
 
         layout.prop(package, "source_uv")
         layout.prop(package, "default_vertex_storage")
+        layout.prop(package, "use_cache")
+
+        layout.prop(package, "format_version")
+
+        if package.format_version != "LEGACY":
+            layout.prop(package, "vertex_order")
+            layout.prop(package, "compression")
+
+            if package.compression != "NONE":
+                layout.prop(package, "compression_level")
+                layout.prop(package, "byte_shuffle")
 
 
 class AttributeExporterEntryPanel(bpy.types.Panel):
@@ -498,6 +516,7 @@ class ATTRIBUTEEXPORTER_UL_AttributeList(bpy.types.UIList):
             row.prop_search(
                 item.selection, "attribute", context.scene, "attribute_choices"
             )
+            row.prop(item, "encoding", text="")
         elif self.layout_type in {"GRID"}:
             layout.alignment = "CENTER"
             layout.label(text="", icon="OBJECT_DATAMODE")
@@ -0,0 +1,856 @@
+import hashlib
+import itertools
+import os
+import struct
+import zlib
+from typing import BinaryIO, Dict, Hashable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy
+
+FORMAT_VERSION = 8
+LEGACY_FORMAT_VERSION = 2
+
+ENCODING_FLOAT32 = 0
+ENCODING_FLOAT16 = 1
+ENCODING_UNORM8 = 2
+ENCODING_UNORM16 = 3
+ENCODING_SNORM16 = 4
+
+# bytes per component for each encoding
+ENCODING_SIZES = {
+    ENCODING_FLOAT32: 4,
+    ENCODING_FLOAT16: 2,
+    ENCODING_UNORM8: 1,
+    ENCODING_UNORM16: 2,
+    ENCODING_SNORM16: 2,
+}
+
+STORAGE_DENSE = 0
+STORAGE_CONSTANT = 1
+STORAGE_SPARSE = 2
+STORAGE_SHARED = 3
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+
+FILTER_NONE = 0
+FILTER_BYTE_SHUFFLE = 1
+
+# which vertices an object's records hold values for
+VERTEX_ORDER_BLENDER = 0
+VERTEX_ORDER_SPLIT = 1
+
+class ContentShare(NamedTuple):
+    """
+    A share key that shares a record with any identical record shared
+    under the same scope. Records in different scopes are never shared,
+    so that one scope's records can't end up pointing into another's.
+    """
+
+    scope: Hashable
+
+
+class FormatSettings(NamedTuple):
+    """
+    How records get written. Compression and filtering only exist from
+    version 3 onwards; version 2 files always hold raw floats. Version 4
+    adds a table of contents, version 5 adds quantized encodings, version
+    6 adds constant and sparse records, version 7 lets records be written
+    in split vertex order, and version 8 lets records refer to identical
+    records of other objects instead of repeating them.
+    """
+
+    version: int = FORMAT_VERSION
+    compression: int = COMPRESSION_NONE
+    level: int = 6
+    filter: int = FILTER_NONE
+
+
+def encode_string(value: str) -> bytes:
+    encoded = value.encode("utf-8")
+    padding = (4 - len(encoded)) % 4
+
+    return struct.pack("<i", len(encoded)) + encoded + b"\x00" * padding
+
+
+class RecordLocation(NamedTuple):
+    name: str
+    offset: int
+    length: int
+
+
+class SharedRecord(NamedTuple):
+    """
+    Where a record that other records can refer to was written.
+    """
+
+    obj: str
+    name: str
+    vertex_count: int
+    dimensions: int
+
+
+class ObjectLocation:
+    name: str
+    offset: int
+    length: int
+    records: List[RecordLocation]
+
+    def __init__(self, name: str, offset: int):
+        self.name = name
+        self.offset = offset
+        self.length = 0
+        self.records = []
+
+
+def encode_toc(objects: List[ObjectLocation]) -> bytes:
+    """
+    Encodes the table of contents: every object's and every record's name,
+    along with where it starts in the file and how many bytes it takes up.
+    """
+    output = []
+
+    for obj in objects:
+        output.append(encode_string(obj.name))
+        output.append(struct.pack("<QQi", obj.offset, obj.length, len(obj.records)))
+
+        for record in obj.records:
+            output.append(encode_string(record.name))
+            output.append(struct.pack("<QQ", record.offset, record.length))
+
+    return b"".join(output)
+
+
+def byte_shuffle(data: numpy.ndarray) -> numpy.ndarray:
+    """
+    Groups the first byte of every value together, then the second, and
+    so on. Neighbouring floats tend to share their sign and exponent bytes,
+    so this makes them much easier to compress.
+    """
+    width = data.dtype.itemsize
+    return numpy.ascontiguousarray(data.view(numpy.uint8).reshape(-1, width).T)
+
+
+def measure_range(data: numpy.ndarray, dimensions: int, encoding: int) -> numpy.ndarray:
+    """
+    Works out the range parameters an encoding stores before its values:
+    nothing for float encodings, each component's minimum and maximum for
+    UNORM encodings, and each component's largest magnitude for SNORM16.
+    NaNs are left out, unless a component holds nothing else.
+    """
+    values = data.reshape(-1, dimensions)
+
+    if encoding in (ENCODING_FLOAT32, ENCODING_FLOAT16):
+        return numpy.empty(0, dtype="<f4")
+
+    if encoding == ENCODING_SNORM16:
+        if not len(values):
+            return numpy.zeros(dimensions, dtype="<f4")
+        return numpy.fmax.reduce(numpy.abs(values), axis=0).astype("<f4")
+
+    if encoding not in (ENCODING_UNORM8, ENCODING_UNORM16):
+        raise ValueError(f"Unknown encoding: {encoding}")
+
+    if not len(values):
+        return numpy.zeros(dimensions * 2, dtype="<f4")
+
+    low = numpy.fmin.reduce(values, axis=0)
+    high = numpy.fmax.reduce(values, axis=0)
+
+    return numpy.concatenate([low, high]).astype("<f4")
+
+
+def combine_ranges(first: numpy.ndarray, second: numpy.ndarray, dimensions: int, encoding: int) -> numpy.ndarray:
+    """
+    The range parameters covering the values of two measured ranges.
+    """
+    if encoding == ENCODING_SNORM16:
+        return numpy.fmax(first, second)
+
+    if encoding in (ENCODING_UNORM8, ENCODING_UNORM16):
+        low = numpy.fmin(first[:dimensions], second[:dimensions])
+        high = numpy.fmax(first[dimensions:], second[dimensions:])
+        return numpy.concatenate([low, high])
+
+    return first
+
+
+def apply_range(data: numpy.ndarray, dimensions: int, encoding: int, params: numpy.ndarray) -> numpy.ndarray:
+    """
+    Converts values to the given encoding, using range parameters from
+    measure_range(). Quantized encodings can't hold NaN, so it becomes
+    the bottom of the range (zero, for SNORM16).
+    """
+    if encoding == ENCODING_FLOAT32:
+        return data
+    if encoding == ENCODING_FLOAT16:
+        return data.astype("<f2")
+
+    values = data.reshape(-1, dimensions).astype(numpy.float64)
+
+    if encoding == ENCODING_SNORM16:
+        magnitude = params.astype(numpy.float64)
+        scale = numpy.where(magnitude > 0, magnitude, 1)
+        scaled = numpy.nan_to_num(values / scale * 32767, nan=0)
+        return numpy.rint(scaled).clip(-32767, 32767).astype("<i2").ravel()
+
+    if encoding == ENCODING_UNORM8:
+        steps, dtype = 255, "<u1"
+    else:
+        steps, dtype = 65535, "<u2"
+
+    low = params[:dimensions].astype(numpy.float64)
+    high = params[dimensions:].astype(numpy.float64)
+
+    scale = numpy.where(high > low, high - low, 1)
+    scaled = numpy.nan_to_num((values - low) / scale * steps, nan=0)
+    return numpy.rint(scaled).clip(0, steps).astype(dtype).ravel()
+
+
+def quantize(data: numpy.ndarray, dimensions: int, encoding: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Converts a record's values to the given encoding. Returns the range
+    parameters that need to be stored before the values (if any), and the
+    converted values.
+
+    UNORM encodings store each component's minimum and maximum, then map
+    that range onto the full range of the integer type. SNORM16 stores each
+    component's largest magnitude, and maps -magnitude..magnitude onto
+    -32767..32767.
+    """
+    params = measure_range(data, dimensions, encoding)
+    return params, apply_range(data, dimensions, encoding, params)
+
+
+def choose_storage(data: numpy.ndarray, dimensions: int, encoding: int) -> Tuple[int, numpy.ndarray]:
+    """
+    Picks whichever storage makes the record smallest before compression.
+    For sparse records, also returns the (sorted) indices of the vertices
+    that aren't zero.
+
+    Values are compared bit for bit, so that -0.0 and NaN survive: a
+    vertex that holds -0.0 isn't zero, and NaNs are equal to themselves.
+    """
+    values = data.reshape(-1, dimensions)
+    none = numpy.empty(0, dtype="<u4")
+
+    if len(values) == 0:
+        return STORAGE_DENSE, none
+
+    bits = values.view(numpy.uint32)
+
+    if (bits == bits[0]).all():
+        return STORAGE_CONSTANT, none
+
+    present = numpy.flatnonzero((bits != 0).any(axis=1))
+    itemsize = ENCODING_SIZES[encoding]
+
+    dense_size = len(values) * dimensions * itemsize
+    sparse_size = 4 + len(present) * (4 + dimensions * itemsize)
+
+    if sparse_size < dense_size:
+        return STORAGE_SPARSE, present.astype("<u4")
+
+    return STORAGE_DENSE, none
+
+
+def encode_payload(prefix: List, values: numpy.ndarray, settings: FormatSettings) -> Tuple[int, int, List]:
+    """
+    Applies the filter and compression from settings to a record's
+    payload. Returns the compression and filter that were actually used,
+    along with the buffers that make up the encoded payload.
+
+    The byte shuffle only applies to the values, not to the indices or
+    range parameters in front of them.
+    """
+    data_filter = settings.filter if settings.compression != COMPRESSION_NONE else FILTER_NONE
+
+    if data_filter == FILTER_BYTE_SHUFFLE:
+        values = byte_shuffle(values)
+
+    if settings.compression == COMPRESSION_ZLIB:
+        compressor = zlib.compressobj(settings.level)
+        payload = [compressor.compress(buffer) for buffer in prefix]
+        payload.append(compressor.compress(values.data))
+        payload.append(compressor.flush())
+        return COMPRESSION_ZLIB, data_filter, [b"".join(payload)]
+
+    return COMPRESSION_NONE, data_filter, prefix + [values.data]
+
+
+def encode_record(
+    name: str,
+    dimensions: int,
+    data: numpy.ndarray,
+    settings: FormatSettings = FormatSettings(),
+    encoding: int = ENCODING_FLOAT32,
+) -> List:
+    """
+    Encodes a single record. The payload is returned as separate buffers,
+    so that it can be written out without being copied.
+
+    Files older than version 5 can only hold 32-bit floats, so the
+    encoding is ignored for them. From version 6, constant records are
+    stored as a single value and mostly-zero records as a list of the
+    vertices that aren't zero.
+    """
+    data = numpy.ascontiguousarray(data, dtype="<f4")
+    header = encode_string(name) + struct.pack("<ii", len(data) // dimensions, dimensions)
+
+    if settings.version < 3:
+        return [header, data.data]
+
+    if settings.version < 5:
+        encoding = ENCODING_FLOAT32
+
+    if settings.version < 6:
+        storage, indices = STORAGE_DENSE, None
+    else:
+        storage, indices = choose_storage(data, dimensions, encoding)
+        header += struct.pack("<i", storage)
+
+    if storage == STORAGE_CONSTANT:
+        encoding = ENCODING_FLOAT32
+        payload = [data[:dimensions].data]
+        compression, data_filter = COMPRESSION_NONE, FILTER_NONE
+    elif storage == STORAGE_SPARSE:
+        values = data.reshape(-1, dimensions)[indices].ravel()
+        params, values = quantize(values, dimensions, encoding)
+        prefix = [struct.pack("<I", len(indices)), indices.data, params.data]
+        compression, data_filter, payload = encode_payload(prefix, values, settings)
+    else:
+        params, values = quantize(data, dimensions, encoding)
+        compression, data_filter, payload = encode_payload([params.data], values, settings)
+
+    length = sum(memoryview(buffer).nbytes for buffer in payload)
+    padding = (4 - length % 4) % 4
+
+    header += struct.pack("<iiii", encoding, compression, data_filter, length)
+
+    return [header, *payload, b"\x00" * padding]
+
+
+class ChunkedValues:
+    """
+    A record's values, handed out a chunk of vertices at a time. With a
+    vertex map, each chunk is gathered into the same scratch buffer, so
+    the mapped values never exist all at once.
+    """
+
+    data: numpy.ndarray
+    dimensions: int
+    chunk_size: int
+    vertex_map: Optional[numpy.ndarray]
+    scratch: Optional[numpy.ndarray]
+
+    def __init__(
+        self,
+        data: numpy.ndarray,
+        dimensions: int,
+        chunk_size: int,
+        vertex_map: Optional[numpy.ndarray] = None,
+    ):
+        self.data = numpy.ascontiguousarray(data, dtype="<f4").reshape(-1, dimensions)
+        self.dimensions = dimensions
+        self.chunk_size = max(1, chunk_size)
+        self.vertex_map = vertex_map
+        self.scratch = None
+
+        if vertex_map is not None:
+            self.scratch = numpy.empty((self.chunk_size, dimensions), dtype="<f4")
+
+    def __len__(self) -> int:
+        return len(self.data) if self.vertex_map is None else len(self.vertex_map)
+
+    def chunks(self) -> Iterator[numpy.ndarray]:
+        """
+        Yields each chunk's values, with one row per vertex. A chunk is
+        only valid until the next one is asked for.
+        """
+        count = len(self)
+
+        for start in range(0, count, self.chunk_size):
+            end = min(start + self.chunk_size, count)
+
+            if self.vertex_map is None:
+                yield self.data[start:end]
+            else:
+                rows = self.scratch[: end - start]
+                numpy.take(self.data, self.vertex_map[start:end], axis=0, out=rows)
+                yield rows
+
+
+class ChunkedRecord(NamedTuple):
+    """
+    A record being encoded a chunk at a time. The header stops short of
+    the payload length, which is None if it won't be known until the
+    whole payload has been produced (when it's compressed, say).
+    """
+
+    header: bytes
+    length: Optional[int]
+    payload: Iterator
+
+
+def survey_chunks(
+    values: ChunkedValues, encoding: int, digest: Optional["hashlib._Hash"] = None
+) -> Tuple[bool, int, numpy.ndarray, numpy.ndarray]:
+    """
+    Goes over every chunk once to find out what encode_record() would
+    have found looking at the whole record: whether every vertex is the
+    same, how many vertices aren't zero, and the range parameters for
+    every vertex and for just the ones that aren't zero.
+
+    If a digest is given, every chunk's values are hashed into it too.
+    """
+    dimensions = values.dimensions
+    first = None
+    constant = True
+    present = 0
+    ranges = [None, None]
+
+    for rows in values.chunks():
+        # compared bit for bit, like choose_storage() does
+        bits = rows.view(numpy.uint32)
+
+        if digest is not None:
+            digest.update(bits.data)
+
+        if first is None:
+            first = bits[0].copy()
+
+        constant = constant and bool((bits == first).all())
+        nonzero = rows[(bits != 0).any(axis=1)]
+        present += len(nonzero)
+
+        for index, subset in enumerate((rows, nonzero)):
+            if not len(subset):
+                continue
+
+            found = measure_range(subset, dimensions, encoding)
+
+            if ranges[index] is not None:
+                found = combine_ranges(ranges[index], found, dimensions, encoding)
+
+            ranges[index] = found
+
+    empty = measure_range(numpy.empty(0, dtype="<f4"), dimensions, encoding)
+    dense_range, sparse_range = (empty if found is None else found for found in ranges)
+
+    return constant, present, dense_range, sparse_range
+
+
+def encode_chunked(
+    name: str,
+    values: ChunkedValues,
+    settings: FormatSettings = FormatSettings(),
+    encoding: int = ENCODING_FLOAT32,
+    digest: Optional["hashlib._Hash"] = None,
+) -> ChunkedRecord:
+    """
+    Encodes a record like encode_record() does, but only ever holds a
+    chunk of it in memory: the values are gone over once to pick the
+    storage and range, and then once more (or once per byte, when they're
+    byte-shuffled) to produce the payload.
+
+    If a digest is given, everything that the record's bytes depend on,
+    apart from its name and the settings, is hashed into it while the
+    values are first gone over. Records with the same digest come out
+    the same.
+    """
+    dimensions = values.dimensions
+    count = len(values)
+    header = encode_string(name) + struct.pack("<ii", count, dimensions)
+
+    if settings.version < 3:
+        return ChunkedRecord(header, count * dimensions * 4, (rows.data for rows in values.chunks()))
+
+    if settings.version < 5:
+        encoding = ENCODING_FLOAT32
+
+    if digest is not None:
+        digest.update(struct.pack("<iii", count, dimensions, encoding))
+
+    constant, present, dense_range, sparse_range = survey_chunks(values, encoding, digest)
+    itemsize = ENCODING_SIZES[encoding]
+    storage = STORAGE_DENSE
+
+    if settings.version >= 6 and count:
+        if constant:
+            storage = STORAGE_CONSTANT
+        elif 4 + present * (4 + dimensions * itemsize) < count * dimensions * itemsize:
+            storage = STORAGE_SPARSE
+
+    if settings.version >= 6:
+        header += struct.pack("<i", storage)
+
+    if storage == STORAGE_CONSTANT:
+        first = next(values.chunks())[0]
+        header += struct.pack("<iii", ENCODING_FLOAT32, COMPRESSION_NONE, FILTER_NONE)
+        return ChunkedRecord(header, dimensions * 4, iter([first.tobytes()]))
+
+    sparse = storage == STORAGE_SPARSE
+    params = sparse_range if sparse else dense_range
+    rows_written = present if sparse else count
+
+    data_filter = settings.filter if settings.compression != COMPRESSION_NONE else FILTER_NONE
+    header += struct.pack("<iii", encoding, settings.compression, data_filter)
+
+    def chunk_values() -> Iterator[numpy.ndarray]:
+        for rows in values.chunks():
+            if sparse:
+                rows = rows[(rows != 0).any(axis=1)]
+            yield apply_range(rows.ravel(), dimensions, encoding, params)
+
+    def prefix() -> Iterator:
+        if sparse:
+            yield struct.pack("<I", present)
+            start = 0
+
+            for rows in values.chunks():
+                yield (numpy.flatnonzero((rows != 0).any(axis=1)) + start).astype("<u4").data
+                start += len(rows)
+
+        yield params.data
+
+    def payload_values() -> Iterator:
+        if data_filter != FILTER_BYTE_SHUFFLE:
+            for chunk in chunk_values():
+                yield chunk.data
+            return
+
+        # byte_shuffle() on the whole record puts every value's first byte
+        # first, so go over the values once for each byte
+        for byte in range(itemsize):
+            for chunk in chunk_values():
+                yield numpy.ascontiguousarray(chunk.view(numpy.uint8).reshape(-1, itemsize)[:, byte]).data
+
+    payload = itertools.chain(prefix(), payload_values())
+
+    if settings.compression == COMPRESSION_ZLIB:
+        return ChunkedRecord(header, None, compress_chunks(payload, settings.level))
+
+    length = params.nbytes + rows_written * dimensions * itemsize
+
+    if sparse:
+        length += 4 + present * 4
+
+    return ChunkedRecord(header, length, payload)
+
+
+def compress_chunks(buffers: Iterator, level: int) -> Iterator[bytes]:
+    """
+    Compresses a stream of buffers as a single zlib stream.
+    """
+    compressor = zlib.compressobj(level)
+
+    for buffer in buffers:
+        compressed = compressor.compress(buffer)
+
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+def encode_shared_record(name: str, shared: SharedRecord) -> List:
+    """
+    Encodes a record that holds no values of its own. Its payload names
+    the object and record that hold them instead.
+    """
+    payload = encode_string(shared.obj) + encode_string(shared.name)
+
+    header = encode_string(name) + struct.pack(
+        "<iiiiiii",
+        shared.vertex_count,
+        shared.dimensions,
+        STORAGE_SHARED,
+        ENCODING_FLOAT32,
+        COMPRESSION_NONE,
+        FILTER_NONE,
+        len(payload),
+    )
+
+    return [header, payload]
+
+
+def hash_record(name: str, buffers: List) -> bytes:
+    """
+    Hashes everything about an encoded record except for its name.
+    """
+    digest = hashlib.sha1(memoryview(buffers[0])[len(encode_string(name)) :])
+
+    for buffer in buffers[1:]:
+        digest.update(buffer)
+
+    return digest.digest()
+
+
+class Writer:
+    """
+    Streams an .attrdata file to disk as it is produced, so that we never
+    hold more than a single record in memory.
+
+    The file is written next to its destination and only moved into place
+    once everything has been written; if the export fails part-way, the
+    previous file is left alone.
+
+    The table of contents can only be filled in once everything has been
+    written, so space for it is reserved up front and it gets written over
+    that space at the end.
+
+    From version 8, records can be shared: once a record has been written
+    with a share key, later records written with the same key just refer
+    to it.
+    """
+
+    path: str
+    settings: FormatSettings
+    file: Optional[BinaryIO]
+    tee: Optional[BinaryIO]
+    position: int
+    toc_offset: int
+    toc_length: int
+    objects: List[ObjectLocation]
+    shared: Dict[Hashable, SharedRecord]
+
+    def __init__(self, path: str, settings: FormatSettings = FormatSettings()):
+        self.path = path
+        self.settings = settings
+        self.file = None
+        self.tee = None
+        self.position = 0
+        self.toc_offset = 0
+        self.toc_length = 0
+        self.objects = []
+        self.shared = {}
+
+    def __enter__(self) -> "Writer":
+        self.file = open(self.path + ".tmp", "wb")
+        return self
+
+    def __exit__(self, exc_type, *args):
+        success = exc_type is None
+
+        try:
+            if success:
+                self.write_toc()
+        except BaseException:
+            success = False
+            raise
+        finally:
+            self.close(success)
+
+    def close(self, success: bool) -> None:
+        self.file.close()
+
+        if success:
+            os.replace(self.path + ".tmp", self.path)
+        else:
+            os.remove(self.path + ".tmp")
+
+    def write_toc(self) -> None:
+        if self.settings.version < 4:
+            return
+
+        for obj, following in zip(self.objects, self.objects[1:] + [None]):
+            end = following.offset if following else self.position
+            obj.length = end - obj.offset
+
+        toc = encode_toc(self.objects)
+
+        if len(toc) != self.toc_length:
+            raise ValueError("The objects written don't match the table of contents.")
+
+        self.file.seek(self.toc_offset)
+        self.file.write(toc)
+
+    def write_bytes(self, data) -> None:
+        self.file.write(data)
+        self.position += memoryview(data).nbytes
+
+        if self.tee:
+            self.tee.write(data)
+
+    def write_int(self, value: int) -> None:
+        self.write_bytes(struct.pack("<i", value))
+
+    def write_buffers(self, buffers: List) -> None:
+        for buffer in buffers:
+            self.write_bytes(buffer)
+
+    def write_string(self, value: str) -> None:
+        self.write_bytes(encode_string(value))
+
+    def write_header(self, layout: List[Tuple[str, List[str]]]) -> None:
+        """
+        Writes the header. layout lists every object's name and the names
+        of its records, in the order they're going to be written.
+        """
+        self.write_int(self.settings.version)
+        self.write_int(len(layout))
+
+        if self.settings.version >= 4:
+            placeholder = []
+
+            for name, records in layout:
+                obj = ObjectLocation(name, 0)
+                obj.records = [RecordLocation(record, 0, 0) for record in records]
+                placeholder.append(obj)
+
+            toc = encode_toc(placeholder)
+
+            self.toc_offset = self.position
+            self.toc_length = len(toc)
+            self.write_bytes(toc)
+
+    def write_object(
+        self,
+        name: str,
+        source_uv: Tuple[int, int],
+        record_count: int,
+        vertex_order: int = VERTEX_ORDER_BLENDER,
+    ) -> None:
+        self.objects.append(ObjectLocation(name, self.position))
+
+        self.write_string(name)
+        self.write_int(source_uv[0])
+        self.write_int(source_uv[1])
+        self.write_int(record_count)
+
+        if self.settings.version >= 7:
+            self.write_int(vertex_order)
+
+    def write_copied_object(self, name: str, records: List[RecordLocation]) -> None:
+        """
+        Notes down where an object that's about to be copied in verbatim
+        starts. The records' offsets are relative to the start of the object.
+        """
+        obj = ObjectLocation(name, self.position)
+        obj.records = [
+            RecordLocation(record.name, self.position + record.offset, record.length)
+            for record in records
+        ]
+        self.objects.append(obj)
+
+    def write_encoded_record(self, name: str, buffers: List, share: Optional[Hashable] = None) -> None:
+        """
+        Writes a record that encode_record() produced. If share is given,
+        later records can refer to this one with write_shared_record().
+
+        With a ContentShare, the record is shared under a hash of its
+        contents, and if an identical record has already been shared in
+        the same scope, this one refers to it instead of being written again.
+        """
+        if self.settings.version < 8:
+            share = None
+
+        if isinstance(share, ContentShare):
+            share = (share, hash_record(name, buffers))
+
+            if share in self.shared:
+                self.write_shared_record(name, share)
+                return
+
+        offset = self.position
+        self.write_buffers(buffers)
+        self.objects[-1].records.append(RecordLocation(name, offset, self.position - offset))
+
+        if share is not None:
+            vertex_count, dimensions = struct.unpack_from("<ii", buffers[0], len(encode_string(name)))
+            self.shared[share] = SharedRecord(self.objects[-1].name, name, vertex_count, dimensions)
+
+    def write_chunked_record(
+        self,
+        name: str,
+        values: ChunkedValues,
+        encoding: int = ENCODING_FLOAT32,
+        share: Optional[Hashable] = None,
+    ) -> None:
+        """
+        Encodes and writes a record a chunk at a time, so that only one
+        chunk of it is ever in memory. The bytes are the same ones
+        write_record() would have written.
+
+        A chunked record can't be hashed after it's encoded, like
+        write_encoded_record() does, so a ContentShare shares it under a
+        hash of its values instead, taken before anything is written.
+        """
+        if self.settings.version < 8:
+            share = None
+
+        digest = hashlib.sha1() if isinstance(share, ContentShare) else None
+        record = encode_chunked(name, values, self.settings, encoding, digest)
+
+        if digest is not None:
+            share = (share, digest.digest())
+
+            if share in self.shared:
+                self.write_shared_record(name, share)
+                return
+
+        offset = self.position
+
+        self.write_bytes(record.header)
+
+        if self.settings.version >= 3:
+            length_mark = self.mark()
+            self.write_int(record.length or 0)
+
+        start = self.position
+
+        for buffer in record.payload:
+            self.write_bytes(buffer)
+
+        length = self.position - start
+
+        if record.length is not None and length != record.length:
+            raise ValueError(f"{name} came out as {length} bytes instead of {record.length}.")
+
+        if self.settings.version >= 3:
+            if record.length is None:
+                self.overwrite(length_mark, struct.pack("<i", length))
+
+            self.write_bytes(b"\x00" * ((4 - length % 4) % 4))
+
+        self.objects[-1].records.append(RecordLocation(name, offset, self.position - offset))
+
+        if share is not None:
+            self.shared[share] = SharedRecord(self.objects[-1].name, name, len(values), values.dimensions)
+
+    def mark(self) -> Tuple[int, Optional[int]]:
+        """
+        Where the next bytes are going to be written, both in the file and
+        in the tee (if there is one), for overwrite().
+        """
+        return self.position, self.tee.tell() if self.tee else None
+
+    def overwrite(self, mark: Tuple[int, Optional[int]], data: bytes) -> None:
+        """
+        Writes over bytes that were written at mark, then carries on from
+        the end of the file again.
+        """
+        position, tee_position = mark
+
+        self.file.seek(position)
+        self.file.write(data)
+        self.file.seek(0, os.SEEK_END)
+
+        if self.tee and tee_position is not None:
+            self.tee.seek(tee_position)
+            self.tee.write(data)
+            self.tee.seek(0, os.SEEK_END)
+
+    def write_shared_record(self, name: str, share: Hashable) -> None:
+        """
+        Writes a record that refers to one that was shared earlier.
+        """
+        if self.settings.version < 8:
+            raise ValueError(f"Records can only be shared from version 8 onwards, not {self.settings.version}.")
+
+        self.write_encoded_record(name, encode_shared_record(name, self.shared[share]))
+
+    def write_record(
+        self, name: str, dimensions: int, data: numpy.ndarray, encoding: int = ENCODING_FLOAT32
+    ) -> None:
+        self.write_encoded_record(name, encode_record(name, dimensions, data, self.settings, encoding))